@@ -8,6 +8,7 @@ from app.models.sessions import *
 from app.models.whatsapp import *
 from app.models.order import *
 from app.models.tenants import *
+from app.models.usage import *
 from app.core.config import settings
 
 # Configuración de logging
@@ -0,0 +1,26 @@
+"""Agregar ventana de agrupación de mensajes a tenants
+
+Revision ID: 4f1c9a7d2b6e
+Revises: ac31541545e9
+Create Date: 2026-10-18 11:03:47.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1c9a7d2b6e'
+down_revision: Union[str, None] = 'ac31541545e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tenants', sa.Column('message_coalesce_ms', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('tenants', 'message_coalesce_ms')
@@ -0,0 +1,143 @@
+"""Crear versiones de menú compartidas por las sesiones
+
+Revision ID: a6c94e1f27d8
+Revises: f3a8c61d09b5
+Create Date: 2026-10-18 16:12:45.280371
+
+"""
+import hashlib
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c94e1f27d8'
+down_revision: Union[str, None] = 'f3a8c61d09b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+sessions = sa.table(
+    'sessions',
+    sa.column('id', sa.Integer),
+    sa.column('tenant_id', sa.Integer),
+    sa.column('context', sa.Text),
+    sa.column('menu_version_id', sa.Integer),
+)
+menu_versions = sa.table(
+    'menu_versions',
+    sa.column('id', sa.Integer),
+    sa.column('tenant_id', sa.Integer),
+    sa.column('content_hash', sa.String),
+    sa.column('menu', sa.Text),
+)
+
+
+def menu_fingerprint(menu) -> str:
+    # Igual que `menu_snapshot_service.menu_fingerprint`
+    canonical = json.dumps(menu, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def upgrade() -> None:
+    op.create_table(
+        'menu_versions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('menu', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'content_hash', name='uq_menu_versions_tenant_hash')
+    )
+    op.create_index(op.f('ix_menu_versions_id'), 'menu_versions', ['id'], unique=False)
+    op.add_column('sessions', sa.Column('menu_version_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'sessions_menu_version_id_fkey', 'sessions', 'menu_versions',
+        ['menu_version_id'], ['id']
+    )
+
+    # Sacar el menú de cada contexto a `menu_versions` (una fila por menú distinto)
+    bind = op.get_bind()
+    version_ids = {}  # (tenant_id, hash) -> id
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(sessions.c.id, sessions.c.tenant_id, sessions.c.context)
+            .where(sessions.c.id > last_id)
+            .order_by(sessions.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for session_id, tenant_id, raw_context in rows:
+            try:
+                context = json.loads(raw_context) if raw_context else None
+            except ValueError:
+                continue
+            if not isinstance(context, dict) or 'menu' not in context:
+                continue
+
+            menu = context.pop('menu')
+            context.pop('menu_version', None)
+            key = (tenant_id, menu_fingerprint(menu))
+            if key not in version_ids:
+                version_ids[key] = bind.execute(
+                    menu_versions.insert()
+                    .values(
+                        tenant_id=tenant_id,
+                        content_hash=key[1],
+                        menu=json.dumps(menu, ensure_ascii=False),
+                    )
+                    .returning(menu_versions.c.id)
+                ).scalar_one()
+
+            context['menu_version_id'] = version_ids[key]
+            bind.execute(
+                sessions.update()
+                .where(sessions.c.id == session_id)
+                .values(
+                    context=json.dumps(context),
+                    menu_version_id=version_ids[key],
+                )
+            )
+
+
+def downgrade() -> None:
+    # Volver a copiar el menú en el contexto de cada sesión
+    bind = op.get_bind()
+    menus = {
+        version_id: (content_hash, json.loads(menu))
+        for version_id, content_hash, menu in bind.execute(
+            sa.select(menu_versions.c.id, menu_versions.c.content_hash, menu_versions.c.menu)
+        ).all()
+    }
+    for session_id, raw_context, version_id in bind.execute(
+        sa.select(sessions.c.id, sessions.c.context, sessions.c.menu_version_id)
+        .where(sessions.c.menu_version_id.isnot(None))
+    ).all():
+        try:
+            context = json.loads(raw_context) if raw_context else None
+        except ValueError:
+            continue
+        if not isinstance(context, dict) or version_id not in menus:
+            continue
+        context.pop('menu_version_id', None)
+        context['menu_version'], context['menu'] = menus[version_id]
+        bind.execute(
+            sessions.update()
+            .where(sessions.c.id == session_id)
+            .values(context=json.dumps(context))
+        )
+
+    op.drop_constraint('sessions_menu_version_id_fkey', 'sessions', type_='foreignkey')
+    op.drop_column('sessions', 'menu_version_id')
+    op.drop_index(op.f('ix_menu_versions_id'), table_name='menu_versions')
+    op.drop_table('menu_versions')
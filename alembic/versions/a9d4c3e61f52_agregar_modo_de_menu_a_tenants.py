@@ -0,0 +1,26 @@
+"""Agregar modo del menú en el prompt a tenants
+
+Revision ID: a9d4c3e61f52
+Revises: f7c2e5a9b418
+Create Date: 2026-10-18 19:02:48.276519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4c3e61f52'
+down_revision: Union[str, None] = 'f7c2e5a9b418'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tenants', sa.Column('menu_prompt_mode', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('tenants', 'menu_prompt_mode')
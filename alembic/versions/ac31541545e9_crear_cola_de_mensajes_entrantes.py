@@ -0,0 +1,45 @@
+"""Crear cola de mensajes entrantes
+
+Revision ID: ac31541545e9
+Revises: 709ee05e535b
+Create Date: 2026-10-18 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ac31541545e9'
+down_revision: Union[str, None] = '709ee05e535b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'inbound_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message_id', sa.String(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('from_number', sa.String(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('message_id')
+    )
+    op.create_index(op.f('ix_inbound_messages_id'), 'inbound_messages', ['id'], unique=False)
+    op.create_index(op.f('ix_inbound_messages_status'), 'inbound_messages', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_inbound_messages_status'), table_name='inbound_messages')
+    op.drop_index(op.f('ix_inbound_messages_id'), table_name='inbound_messages')
+    op.drop_table('inbound_messages')
@@ -0,0 +1,37 @@
+"""Crear caché de transcripciones de audio
+
+Revision ID: b7e2d40c9a13
+Revises: 4f1c9a7d2b6e
+Create Date: 2026-10-18 12:26:05.731942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d40c9a13'
+down_revision: Union[str, None] = '4f1c9a7d2b6e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'audio_transcriptions',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('media_id', sa.String(), nullable=True),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('content_hash')
+    )
+    op.create_index(op.f('ix_audio_transcriptions_media_id'), 'audio_transcriptions', ['media_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_audio_transcriptions_media_id'), table_name='audio_transcriptions')
+    op.drop_table('audio_transcriptions')
@@ -0,0 +1,52 @@
+"""Índices para las consultas frecuentes
+
+Revision ID: c5d27b8e4f10
+Revises: a6c94e1f27d8
+Create Date: 2026-10-18 16:48:21.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d27b8e4f10'
+down_revision: Union[str, None] = 'a6c94e1f27d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Antes del índice único: dejar solo la sesión activa más reciente de
+    # cada usuario y tenant
+    op.execute(
+        """
+        UPDATE sessions SET active = false
+        WHERE active AND id NOT IN (
+            SELECT max(id) FROM sessions WHERE active GROUP BY tenant_id, user_id
+        )
+        """
+    )
+    op.create_index(
+        'uq_sessions_active_user', 'sessions', ['tenant_id', 'user_id'],
+        unique=True, postgresql_where=sa.text('active')
+    )
+
+    op.create_index('ix_categories_tenant_name', 'categories', ['tenant_id', 'name'], unique=False)
+    op.create_index('ix_menu_items_category_name', 'menu_items', ['category_id', 'name'], unique=False)
+    op.create_index('ix_extras_menu_item_name', 'extras', ['menu_item_id', 'name'], unique=False)
+    op.create_index(op.f('ix_processed_messages_created_at'), 'processed_messages', ['created_at'], unique=False)
+    op.create_index(op.f('ix_payments_order_id'), 'payments', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_index(op.f('ix_payments_order_id'), table_name='payments')
+    op.drop_index(op.f('ix_processed_messages_created_at'), table_name='processed_messages')
+    op.drop_index('ix_extras_menu_item_name', table_name='extras')
+    op.drop_index('ix_menu_items_category_name', table_name='menu_items')
+    op.drop_index('ix_categories_tenant_name', table_name='categories')
+    op.drop_index('uq_sessions_active_user', table_name='sessions')
@@ -0,0 +1,26 @@
+"""Agregar presupuesto de tokens de historial a tenants
+
+Revision ID: d41a6e8f3c27
+Revises: b7e2d40c9a13
+Create Date: 2026-10-18 13:40:12.904317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a6e8f3c27'
+down_revision: Union[str, None] = 'b7e2d40c9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tenants', sa.Column('history_token_budget', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('tenants', 'history_token_budget')
@@ -0,0 +1,38 @@
+"""Archivar sesiones inactivas
+
+Revision ID: d8e1f4a7b392
+Revises: c5d27b8e4f10
+Create Date: 2026-10-18 17:20:54.617203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e1f4a7b392'
+down_revision: Union[str, None] = 'c5d27b8e4f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tenants', sa.Column('session_idle_minutes', sa.Integer(), nullable=True))
+    op.create_table(
+        'session_archives',
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('context', sa.LargeBinary(), nullable=False),
+        sa.Column('original_bytes', sa.Integer(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['sessions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('session_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('session_archives')
+    op.drop_column('tenants', 'session_idle_minutes')
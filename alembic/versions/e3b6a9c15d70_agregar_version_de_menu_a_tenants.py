@@ -0,0 +1,26 @@
+"""Agregar versión de menú a tenants
+
+Revision ID: e3b6a9c15d70
+Revises: d8e1f4a7b392
+Create Date: 2026-10-18 17:53:12.348860
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b6a9c15d70'
+down_revision: Union[str, None] = 'd8e1f4a7b392'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tenants', sa.Column('menu_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('tenants', 'menu_version')
@@ -0,0 +1,45 @@
+"""Crear tabla de consumo de LLM
+
+Revision ID: e9b3f17a52d4
+Revises: d41a6e8f3c27
+Create Date: 2026-10-18 15:02:38.116540
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b3f17a52d4'
+down_revision: Union[str, None] = 'd41a6e8f3c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'llm_usage',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('calls', sa.Integer(), nullable=False),
+        sa.Column('prompt_tokens', sa.BigInteger(), nullable=False),
+        sa.Column('cached_tokens', sa.BigInteger(), nullable=False),
+        sa.Column('completion_tokens', sa.BigInteger(), nullable=False),
+        sa.Column('latency_ms_total', sa.BigInteger(), nullable=False),
+        sa.Column('latency_ms_max', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('tenant_id', 'session_id', 'day', 'model', name='uq_llm_usage_key')
+    )
+    op.create_index(op.f('ix_llm_usage_id'), 'llm_usage', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_llm_usage_id'), table_name='llm_usage')
+    op.drop_table('llm_usage')
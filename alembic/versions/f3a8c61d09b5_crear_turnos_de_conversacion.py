@@ -0,0 +1,130 @@
+"""Crear turnos de conversación
+
+Revision ID: f3a8c61d09b5
+Revises: e9b3f17a52d4
+Create Date: 2026-10-18 15:41:07.532918
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8c61d09b5'
+down_revision: Union[str, None] = 'e9b3f17a52d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+sessions = sa.table(
+    'sessions',
+    sa.column('id', sa.Integer),
+    sa.column('tenant_id', sa.Integer),
+    sa.column('context', sa.Text),
+)
+conversation_turns = sa.table(
+    'conversation_turns',
+    sa.column('tenant_id', sa.Integer),
+    sa.column('session_id', sa.Integer),
+    sa.column('seq', sa.Integer),
+    sa.column('user_message', sa.Text),
+    sa.column('bot_response', sa.Text),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversation_turns',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('tenant_id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.Integer(), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('user_message', sa.Text(), nullable=False),
+        sa.Column('bot_response', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.id'], ),
+        sa.ForeignKeyConstraint(['session_id'], ['sessions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('session_id', 'seq', name='uq_conversation_turns_session_seq')
+    )
+
+    # Pasar la conversación guardada en cada contexto a filas de turnos
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(sessions.c.id, sessions.c.tenant_id, sessions.c.context)
+            .where(sessions.c.id > last_id)
+            .order_by(sessions.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        turns = []
+        for session_id, tenant_id, raw_context in rows:
+            try:
+                context = json.loads(raw_context) if raw_context else None
+            except ValueError:
+                continue
+            if not isinstance(context, dict) or 'conversation' not in context:
+                continue
+
+            for seq, entry in enumerate(context.pop('conversation') or [], start=1):
+                turns.append({
+                    'tenant_id': tenant_id,
+                    'session_id': session_id,
+                    'seq': seq,
+                    'user_message': entry.get('user') or '',
+                    'bot_response': entry.get('bot'),
+                })
+            context.setdefault('summarized_seq', 0)
+            bind.execute(
+                sessions.update()
+                .where(sessions.c.id == session_id)
+                .values(context=json.dumps(context))
+            )
+
+        if turns:
+            bind.execute(conversation_turns.insert(), turns)
+
+
+def downgrade() -> None:
+    # Devolver los turnos al contexto de cada sesión
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(
+            conversation_turns.c.session_id,
+            conversation_turns.c.user_message,
+            conversation_turns.c.bot_response,
+        ).order_by(conversation_turns.c.session_id, conversation_turns.c.seq)
+    ).all()
+    by_session = {}
+    for session_id, user_message, bot_response in rows:
+        by_session.setdefault(session_id, []).append(
+            {'user': user_message, 'bot': bot_response}
+        )
+
+    for session_id, raw_context in bind.execute(
+        sa.select(sessions.c.id, sessions.c.context)
+    ).all():
+        try:
+            context = json.loads(raw_context) if raw_context else None
+        except ValueError:
+            continue
+        if not isinstance(context, dict):
+            continue
+        context['conversation'] = by_session.get(session_id, [])
+        context.pop('summarized_seq', None)
+        bind.execute(
+            sessions.update()
+            .where(sessions.c.id == session_id)
+            .values(context=json.dumps(context))
+        )
+
+    op.drop_table('conversation_turns')
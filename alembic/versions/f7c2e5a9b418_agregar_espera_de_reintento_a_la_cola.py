@@ -0,0 +1,26 @@
+"""Agregar espera de reintento a la cola de mensajes entrantes
+
+Revision ID: f7c2e5a9b418
+Revises: e3b6a9c15d70
+Create Date: 2026-10-18 18:41:27.915304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c2e5a9b418'
+down_revision: Union[str, None] = 'e3b6a9c15d70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('inbound_messages', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('inbound_messages', 'next_attempt_at')
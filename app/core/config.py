@@ -13,6 +13,11 @@ class Settings(BaseSettings):
     )
 
     # Configuración de WhatsApp API
+    # Segundos que se mantienen en memoria los tenants (teléfono y token):
+    # un tenant editado en la base de datos se aplica como mucho en este tiempo
+    TENANT_CACHE_TTL_SECONDS: int = Field(
+        300, env="TENANT_CACHE_TTL_SECONDS", example=300
+    )
     WHATSAPP_API_URL: str = Field(
         ...,
         env="WHATSAPP_API_URL",
@@ -23,11 +28,158 @@ class Settings(BaseSettings):
     )
     WHATSAPP_VERSION_API: str = Field(..., env="WHATSAPP_VERSION_API", example="v22.0")
 
+    # Cliente HTTP compartido para la Graph API
+    HTTP_MAX_CONNECTIONS: int = Field(100, env="HTTP_MAX_CONNECTIONS", example=100)
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(
+        20, env="HTTP_MAX_KEEPALIVE_CONNECTIONS", example=20
+    )
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = Field(
+        30.0, env="HTTP_KEEPALIVE_EXPIRY_SECONDS", example=30.0
+    )
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = Field(
+        5.0, env="HTTP_CONNECT_TIMEOUT_SECONDS", example=5.0
+    )
+    HTTP_READ_TIMEOUT_SECONDS: float = Field(
+        30.0, env="HTTP_READ_TIMEOUT_SECONDS", example=30.0
+    )
+
+    # Despachador de salida: límite por tenant y reintentos de 429/5xx
+    WHATSAPP_SEND_RATE_PER_SECOND: float = Field(
+        20.0, env="WHATSAPP_SEND_RATE_PER_SECOND", example=20.0
+    )
+    WHATSAPP_SEND_BURST: int = Field(20, env="WHATSAPP_SEND_BURST", example=20)
+    WHATSAPP_SEND_MAX_ATTEMPTS: int = Field(
+        5, env="WHATSAPP_SEND_MAX_ATTEMPTS", example=5
+    )
+    WHATSAPP_SEND_BACKOFF_BASE_SECONDS: float = Field(
+        0.5, env="WHATSAPP_SEND_BACKOFF_BASE_SECONDS", example=0.5
+    )
+    WHATSAPP_SEND_BACKOFF_MAX_SECONDS: float = Field(
+        30.0, env="WHATSAPP_SEND_BACKOFF_MAX_SECONDS", example=30.0
+    )
+    WHATSAPP_SEND_SHUTDOWN_TIMEOUT_SECONDS: float = Field(
+        10.0, env="WHATSAPP_SEND_SHUTDOWN_TIMEOUT_SECONDS", example=10.0
+    )
+
     # Configuración del webhook de WhatsApp
     VERIFY_TOKEN: str = Field(..., env="VERIFY_TOKEN", example="your-verify-token")
 
+    # Ingesta de mensajes: "inline" procesa dentro del webhook,
+    # "queue" encola en base de datos y responde 200 inmediatamente.
+    # WHATSAPP_WORKERS limita las conversaciones procesadas a la vez.
+    WHATSAPP_INGESTION_MODE: str = Field(
+        "inline", env="WHATSAPP_INGESTION_MODE", example="queue"
+    )
+    WHATSAPP_WORKERS: int = Field(4, env="WHATSAPP_WORKERS", example=4)
+    WHATSAPP_QUEUE_POLL_SECONDS: float = Field(
+        1.0, env="WHATSAPP_QUEUE_POLL_SECONDS", example=1.0
+    )
+    WHATSAPP_QUEUE_MAX_ATTEMPTS: int = Field(
+        3, env="WHATSAPP_QUEUE_MAX_ATTEMPTS", example=3
+    )
+    # Espera antes de reintentar un mensaje fallido: se dobla en cada intento
+    WHATSAPP_QUEUE_RETRY_BASE_SECONDS: float = Field(
+        10.0, env="WHATSAPP_QUEUE_RETRY_BASE_SECONDS", example=10.0
+    )
+    WHATSAPP_QUEUE_RETRY_MAX_SECONDS: float = Field(
+        600.0, env="WHATSAPP_QUEUE_RETRY_MAX_SECONDS", example=600.0
+    )
+    # Nº de WAMID recientes recordados en memoria para descartar reentregas
+    DEDUP_CACHE_SIZE: int = Field(10000, env="DEDUP_CACHE_SIZE", example=10000)
+
+    # Limpieza periódica de mensajes procesados y de la cola de entrada
+    PROCESSED_MESSAGES_RETENTION_HOURS: int = Field(
+        24, env="PROCESSED_MESSAGES_RETENTION_HOURS", example=24
+    )
+    RETENTION_INTERVAL_SECONDS: int = Field(
+        3600, env="RETENTION_INTERVAL_SECONDS", example=3600
+    )
+    RETENTION_BATCH_SIZE: int = Field(1000, env="RETENTION_BATCH_SIZE", example=1000)
+    # Cierre de sesiones abandonadas (el tenant puede fijar su propio tiempo)
+    SESSION_IDLE_MINUTES: int = Field(240, env="SESSION_IDLE_MINUTES", example=240)
+    SESSION_REAPER_INTERVAL_SECONDS: int = Field(
+        300, env="SESSION_REAPER_INTERVAL_SECONDS", example=300
+    )
+
     # Configuración de OpenAI
     OPENAI_API_KEY: str = Field(..., env="OPENAI_API_KEY", example="your-openai-key")
+    OPENAI_CONNECT_TIMEOUT_SECONDS: float = Field(
+        5.0, env="OPENAI_CONNECT_TIMEOUT_SECONDS", example=5.0
+    )
+    OPENAI_READ_TIMEOUT_SECONDS: float = Field(
+        60.0, env="OPENAI_READ_TIMEOUT_SECONDS", example=60.0
+    )
+    OPENAI_MAX_CONNECTIONS: int = Field(50, env="OPENAI_MAX_CONNECTIONS", example=50)
+    OPENAI_MAX_ATTEMPTS: int = Field(4, env="OPENAI_MAX_ATTEMPTS", example=4)
+    OPENAI_BACKOFF_BASE_SECONDS: float = Field(
+        0.5, env="OPENAI_BACKOFF_BASE_SECONDS", example=0.5
+    )
+    OPENAI_BACKOFF_MAX_SECONDS: float = Field(
+        20.0, env="OPENAI_BACKOFF_MAX_SECONDS", example=20.0
+    )
+    # Límite adaptativo de llamadas simultáneas a OpenAI (AIMD)
+    OPENAI_CONCURRENCY_INITIAL: int = Field(
+        8, env="OPENAI_CONCURRENCY_INITIAL", example=8
+    )
+    OPENAI_CONCURRENCY_MIN: int = Field(1, env="OPENAI_CONCURRENCY_MIN", example=1)
+    OPENAI_CONCURRENCY_MAX: int = Field(64, env="OPENAI_CONCURRENCY_MAX", example=64)
+    # Historial de conversación: turnos literales, resumen y presupuesto
+    HISTORY_KEEP_TURNS: int = Field(6, env="HISTORY_KEEP_TURNS", example=6)
+    HISTORY_SUMMARY_BATCH: int = Field(4, env="HISTORY_SUMMARY_BATCH", example=4)
+    HISTORY_TOKEN_BUDGET: int = Field(2000, env="HISTORY_TOKEN_BUDGET", example=2000)
+    TOKENIZER_ENCODING: str = Field(
+        "o200k_base", env="TOKENIZER_ENCODING", example="o200k_base"
+    )
+    # Formato del menú en el prompt: "lines", "json" o "repr" (el original)
+    MENU_ENCODER: str = Field("lines", env="MENU_ENCODER", example="lines")
+    # "full": el menú completo en el prompt; "retrieval": en menús grandes
+    # solo los platos relevantes. Cada tenant puede elegir el suyo
+    # (`tenants.menu_prompt_mode`); este es el valor de los que no lo eligen
+    MENU_PROMPT_MODE: str = Field("full", env="MENU_PROMPT_MODE", example="retrieval")
+    MENU_RETRIEVAL_MIN_MENU_ITEMS: int = Field(
+        60, env="MENU_RETRIEVAL_MIN_MENU_ITEMS", example=60
+    )
+    MENU_RETRIEVAL_MAX_ITEMS: int = Field(
+        30, env="MENU_RETRIEVAL_MAX_ITEMS", example=30
+    )
+    MENU_RETRIEVAL_MIN_SCORE: float = Field(
+        1.5, env="MENU_RETRIEVAL_MIN_SCORE", example=1.5
+    )
+    # Cada cuánto se vuelca el consumo de OpenAI a la tabla llm_usage
+    USAGE_FLUSH_INTERVAL_SECONDS: int = Field(
+        30, env="USAGE_FLUSH_INTERVAL_SECONDS", example=30
+    )
+    # Caché write-behind de contextos de sesión
+    CONTEXT_CACHE_SIZE: int = Field(2000, env="CONTEXT_CACHE_SIZE", example=2000)
+    CONTEXT_FLUSH_DELAY_SECONDS: float = Field(
+        2.0, env="CONTEXT_FLUSH_DELAY_SECONDS", example=2.0
+    )
+    # Prefijos de prompt en caché por (tenant, versión del menú)
+    PROMPT_PREFIX_CACHE_SIZE: int = Field(
+        256, env="PROMPT_PREFIX_CACHE_SIZE", example=256
+    )
+    # Menús decodificados en memoria, compartidos por todas las sesiones
+    MENU_SNAPSHOT_CACHE_SIZE: int = Field(
+        256, env="MENU_SNAPSHOT_CACHE_SIZE", example=256
+    )
+
+    # Notas de voz: tamaño máximo y concurrencia de transcripción
+    AUDIO_MAX_BYTES: int = Field(
+        16 * 1024 * 1024, env="AUDIO_MAX_BYTES", example=16777216
+    )
+    TRANSCRIPTION_MAX_CONCURRENCY: int = Field(
+        4, env="TRANSCRIPTION_MAX_CONCURRENCY", example=4
+    )
+    TRANSCRIPTION_PER_TENANT_CONCURRENCY: int = Field(
+        2, env="TRANSCRIPTION_PER_TENANT_CONCURRENCY", example=2
+    )
+    TRANSCRIPTION_CACHE_SIZE: int = Field(
+        1000, env="TRANSCRIPTION_CACHE_SIZE", example=1000
+    )
+    # Guardar también las transcripciones en la tabla audio_transcriptions
+    TRANSCRIPTION_CACHE_PERSIST: bool = Field(
+        False, env="TRANSCRIPTION_CACHE_PERSIST", example=True
+    )
 
     # Configuración de RedSys
     REDSYS_MERCHANT_CODE: str = Field(
@@ -1,10 +1,24 @@
+import asyncio
 import logging
 
 from fastapi import FastAPI
 from sqlalchemy.exc import SQLAlchemyError
 from app.core.config import settings
 from app.core.dependencies import engine
-from app.routes import menu, payment, whatsapp
+from app.routes import menu, metrics, payment, usage, whatsapp
+from app.services.context_manager_service import session_context_cache
+from app.services.conversation_scheduler_service import conversation_scheduler
+from app.services.history_manager_service import load_tokenizer
+from app.services.http_client_service import close_http_client, init_http_client
+from app.services.message_queue_service import message_queue
+from app.services.openai_client_service import (
+    close_openai_client,
+    init_openai_client,
+)
+from app.services.outbound_service import outbound_dispatcher
+from app.services.retention_service import retention_task
+from app.services.session_reaper_service import session_reaper
+from app.services.usage_service import usage_tracker
 
 
 # 🔥 Configuración del Logger
@@ -29,9 +43,44 @@ async def lifespan(app: FastAPI):
     except SQLAlchemyError as e:
         logger.error(f"❌ Error al conectar a la base de datos: {e}", exc_info=True)
         raise e
+
+    # Startup: Cliente HTTP compartido para la Graph API de WhatsApp
+    await init_http_client()
+
+    # Startup: Cliente asíncrono de OpenAI
+    await init_openai_client()
+
+    # Startup: Precargar el tokenizador fuera del event loop
+    await asyncio.to_thread(load_tokenizer)
+
+    # Startup: Arrancar los workers de la cola de mensajes de WhatsApp
+    if settings.WHATSAPP_INGESTION_MODE == "queue":
+        await message_queue.start()
+
+    # Startup: Limpieza periódica de mensajes procesados
+    retention_task.start()
+
+    # Startup: Cierre periódico de sesiones abandonadas
+    session_reaper.start()
+
+    # Startup: Volcado periódico del consumo de OpenAI
+    usage_tracker.start()
+
     yield  # Yield vacío para manejar el ciclo de vida
 
     # Shutdown: Liberar recursos
+    await retention_task.stop()
+    await session_reaper.stop()
+
+    if settings.WHATSAPP_INGESTION_MODE == "queue":
+        await message_queue.stop()
+    await conversation_scheduler.close()
+    await session_context_cache.close()
+    await outbound_dispatcher.close(settings.WHATSAPP_SEND_SHUTDOWN_TIMEOUT_SECONDS)
+    await close_http_client()
+    await close_openai_client()
+    await usage_tracker.stop()
+
     await engine.dispose()
     logger.info("🛑 Conexión a la base de datos cerrada.")
 
@@ -59,6 +108,16 @@ def create_app() -> FastAPI:
         prefix=f"{settings.API_VERSION}/payments",
         tags=["Payment"],
     )
+    app.include_router(
+        usage.router,
+        prefix=f"{settings.API_VERSION}/usage",
+        tags=["Usage"],
+    )
+    app.include_router(
+        metrics.router,
+        prefix=f"{settings.API_VERSION}/metrics",
+        tags=["Metrics"],
+    )
 
     return app
 
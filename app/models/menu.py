@@ -6,14 +6,19 @@ from sqlalchemy import (
     Boolean,
     ForeignKey,
     Text,
+    DateTime,
+    Index,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 
 from app.models.base import Base
 
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (Index("ix_categories_tenant_name", "tenant_id", "name"),)
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(
@@ -27,6 +32,7 @@ class Category(Base):
 
 class MenuItem(Base):
     __tablename__ = "menu_items"
+    __table_args__ = (Index("ix_menu_items_category_name", "category_id", "name"),)
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(
@@ -45,6 +51,7 @@ class MenuItem(Base):
 
 class Extra(Base):
     __tablename__ = "extras"
+    __table_args__ = (Index("ix_extras_menu_item_name", "menu_item_id", "name"),)
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(
@@ -55,3 +62,26 @@ class Extra(Base):
     available = Column(Boolean, default=True)
     menu_item_id = Column(Integer, ForeignKey("menu_items.id"))
     menu_item = relationship("MenuItem", back_populates="extras")
+
+
+class MenuVersion(Base):
+    """
+    Copia inmutable del menú de un tenant (en el formato de
+    `fetch_menu_as_json`), una por contenido distinto. Las sesiones la
+    referencian por id en lugar de guardar el menú en su contexto.
+    """
+
+    __tablename__ = "menu_versions"
+    __table_args__ = (
+        UniqueConstraint(
+            "tenant_id", "content_hash", name="uq_menu_versions_tenant_hash"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(
+        Integer, ForeignKey("tenants.id"), nullable=False
+    )  # Relación con el tenant
+    content_hash = Column(String(64), nullable=False)  # sha256 del menú
+    menu = Column(Text, nullable=False)  # JSON del menú
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -36,7 +36,7 @@ class OrderItem(Base):
     tenant_id = Column(
         Integer, ForeignKey("tenants.id"), nullable=False
     )  # Relación con el tenant
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     product_name = Column(String, nullable=False)
     unit_price = Column(Numeric(10, 2), nullable=False)
     quantity = Column(Integer, nullable=False)
@@ -54,7 +54,7 @@ class Payment(Base):
     tenant_id = Column(
         Integer, ForeignKey("tenants.id"), nullable=False
     )  # Relación con el tenant
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     status = Column(String, default="pendiente")
     method = Column(String, nullable=False)
     transaction_id = Column(String, nullable=True)
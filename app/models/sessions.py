@@ -6,15 +6,37 @@ from sqlalchemy import (
     Text,
     ForeignKey,
     DateTime,
+    Index,
+    LargeBinary,
+    UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 from datetime import datetime, timezone
 
 from app.models.base import Base
 
 
+def _utcnow() -> datetime:
+    # Se evalúa en cada INSERT/UPDATE, no una sola vez al importar el módulo
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Como mucho una sesión activa por usuario y tenant; también sirve
+        # para buscar la sesión activa en cada mensaje
+        Index(
+            "uq_sessions_active_user",
+            "tenant_id",
+            "user_id",
+            unique=True,
+            postgresql_where=text("active"),
+            sqlite_where=text("active = 1"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(
@@ -22,15 +44,12 @@ class Session(Base):
     )  # Relación con el tenant
     user_id = Column(String, nullable=False)
     context = Column(Text, nullable=True)
+    menu_version_id = Column(
+        Integer, ForeignKey("menu_versions.id"), nullable=True
+    )  # Menú vigente de la sesión (cambia con PATCH /menu/items)
     active = Column(Boolean, default=True)
-    created_at = Column(
-        DateTime, default=datetime.now(timezone.utc).replace(tzinfo=None)
-    )
-    updated_at = Column(
-        DateTime,
-        default=datetime.now(timezone.utc).replace(tzinfo=None),
-        onupdate=datetime.now(timezone.utc).replace(tzinfo=None),
-    )
+    created_at = Column(DateTime, default=_utcnow)
+    updated_at = Column(DateTime, default=_utcnow, onupdate=_utcnow)
 
     logs = relationship("SessionLog", back_populates="session")
 
@@ -45,8 +64,49 @@ class SessionLog(Base):
     session_id = Column(Integer, ForeignKey("sessions.id", ondelete="CASCADE"))
     user_message = Column(Text, nullable=False)
     bot_response = Column(Text, nullable=True)
-    created_at = Column(
-        DateTime, default=datetime.now(timezone.utc).replace(tzinfo=None)
-    )
+    created_at = Column(DateTime, default=_utcnow)
 
     session = relationship("Session", back_populates="logs")
+
+
+class ConversationTurn(Base):
+    """
+    Turno de conversación (mensaje del cliente y respuesta del bot), en orden
+    por `seq` dentro de cada sesión. Solo se insertan filas, nunca se reescriben.
+    """
+
+    __tablename__ = "conversation_turns"
+    __table_args__ = (
+        UniqueConstraint("session_id", "seq", name="uq_conversation_turns_session_seq"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    tenant_id = Column(
+        Integer, ForeignKey("tenants.id"), nullable=False
+    )  # Relación con el tenant
+    session_id = Column(
+        Integer, ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False
+    )
+    seq = Column(Integer, nullable=False)  # 1, 2, 3... dentro de la sesión
+    user_message = Column(Text, nullable=False)
+    bot_response = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class SessionArchive(Base):
+    """
+    Contexto de una sesión cerrada por inactividad, comprimido con zlib
+    (JSON en UTF-8). Al archivarla, `sessions.context` queda vacío.
+    """
+
+    __tablename__ = "session_archives"
+
+    session_id = Column(
+        Integer, ForeignKey("sessions.id", ondelete="CASCADE"), primary_key=True
+    )
+    tenant_id = Column(
+        Integer, ForeignKey("tenants.id"), nullable=False
+    )  # Relación con el tenant
+    context = Column(LargeBinary, nullable=False)
+    original_bytes = Column(Integer, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
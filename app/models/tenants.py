@@ -28,3 +28,18 @@ class Tenant(Base):
     table_number_max = Column(
         Integer, nullable=True, default=10
     )  # Número máximo de mesa
+    message_coalesce_ms = Column(
+        Integer, nullable=True, default=0
+    )  # Ventana (ms) para agrupar ráfagas de mensajes; 0 = desactivado
+    history_token_budget = Column(
+        Integer, nullable=True
+    )  # Tokens máximos de historial en el prompt; vacío = HISTORY_TOKEN_BUDGET
+    menu_version = Column(
+        Integer, nullable=False, default=0, server_default="0"
+    )  # Se incrementa con cada cambio del menú (invalida la caché de menús)
+    session_idle_minutes = Column(
+        Integer, nullable=True
+    )  # Minutos sin actividad para cerrar la sesión; vacío = SESSION_IDLE_MINUTES
+    menu_prompt_mode = Column(
+        String, nullable=True
+    )  # "full" o "retrieval" (solo platos relevantes); vacío = MENU_PROMPT_MODE
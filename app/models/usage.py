@@ -0,0 +1,45 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    UniqueConstraint,
+)
+from sqlalchemy.sql import func
+
+from app.models.base import Base
+
+
+class LLMUsage(Base):
+    """
+    Consumo agregado de OpenAI por tenant, sesión, día y modelo.
+    """
+
+    __tablename__ = "llm_usage"
+    __table_args__ = (
+        UniqueConstraint(
+            "tenant_id", "session_id", "day", "model", name="uq_llm_usage_key"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(
+        Integer, ForeignKey("tenants.id"), nullable=False
+    )  # Relación con el tenant
+    session_id = Column(
+        Integer, nullable=False, default=0
+    )  # 0 = llamada sin sesión asociada
+    day = Column(Date, nullable=False)
+    model = Column(String, nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    cached_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    latency_ms_total = Column(BigInteger, nullable=False, default=0)
+    latency_ms_max = Column(Integer, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
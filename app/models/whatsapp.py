@@ -1,10 +1,6 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Text
 from sqlalchemy.sql import func
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import event
-from datetime import datetime, timedelta
 from app.models.base import Base
-from app.core.dependencies import engine
 
 
 class ProcessedMessage(Base):
@@ -14,20 +10,55 @@ class ProcessedMessage(Base):
     tenant_id = Column(
         Integer, ForeignKey("tenants.id"), nullable=False
     )  # Relación con el tenant
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )  # Limpieza por antigüedad
+
+
+# Estados de la cola de mensajes entrantes
+QUEUE_STATUS_PENDING = "pendiente"
+QUEUE_STATUS_PROCESSING = "procesando"
+QUEUE_STATUS_DONE = "procesado"
+QUEUE_STATUS_FAILED = "fallido"
+
+
+class InboundMessage(Base):
+    """
+    Cola duradera de mensajes entrantes de WhatsApp pendientes de procesar.
+    """
+
+    __tablename__ = "inbound_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    message_id = Column(String, nullable=False, unique=True)
+    tenant_id = Column(
+        Integer, ForeignKey("tenants.id"), nullable=False
+    )  # Relación con el tenant
+    from_number = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # Cuerpo del mensaje en JSON
+    status = Column(String, nullable=False, default=QUEUE_STATUS_PENDING, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(
+        DateTime(timezone=True), nullable=True
+    )  # No se reclama antes de esta fecha (reintentos con espera)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
 
-# Function to delete old records
-def delete_old_records(session, *args, **kwargs):
-    expiration_date = datetime.now() - timedelta(
-        days=1
-    )  # Adjust the timedelta as needed
-    session.query(ProcessedMessage).filter(
-        ProcessedMessage.created_at < expiration_date
-    ).delete()
-    session.commit()
+class AudioTranscription(Base):
+    """
+    Transcripciones de notas de voz, indexadas por hash del contenido.
+    """
 
+    __tablename__ = "audio_transcriptions"
 
-# Set up event listener for automatic deletion
-Session = sessionmaker(bind=engine)
-event.listen(Session, "before_flush", delete_old_records)
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 del audio
+    media_id = Column(String, nullable=True, index=True)
+    tenant_id = Column(
+        Integer, ForeignKey("tenants.id"), nullable=False
+    )  # Relación con el tenant
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
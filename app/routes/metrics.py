@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+
+from app.services.context_manager_service import session_context_cache
+from app.services.conversation_scheduler_service import conversation_scheduler
+from app.services.history_manager_service import history_manager
+from app.services.menu_retrieval_service import menu_index_cache
+from app.services.menu_service import menu_cache
+from app.services.menu_snapshot_service import menu_snapshots
+from app.services.openai_client_service import openai_limiter
+from app.services.outbound_service import outbound_dispatcher
+from app.services.prompt_manager_service import prompt_prefix_cache
+from app.services.session_reaper_service import session_reaper
+from app.services.tenant_registry_service import tenant_registry
+from app.services.transcription_cache_service import transcription_cache
+from app.services.usage_service import usage_tracker
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_metrics():
+    """
+    Devuelve los contadores en memoria de los servicios de la aplicación.
+    """
+    return {
+        "conversation_scheduler": conversation_scheduler.stats(),
+        "tenant_registry": tenant_registry.stats(),
+        "session_contexts": session_context_cache.stats(),
+        "outbound": outbound_dispatcher.stats(),
+        "transcription_cache": transcription_cache.stats(),
+        "openai": openai_limiter.stats(),
+        "prompt_prefix_cache": prompt_prefix_cache.stats(),
+        "history": history_manager.stats(),
+        "menu_retrieval": menu_index_cache.stats(),
+        "menu_cache": menu_cache.stats(),
+        "menu_snapshots": menu_snapshots.stats(),
+        "usage": usage_tracker.stats(),
+        "session_reaper": session_reaper.stats(),
+    }
@@ -0,0 +1,87 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.dependencies import get_db
+from app.models.usage import LLMUsage
+from app.services.usage_service import usage_tracker
+
+router = APIRouter()
+
+TOTALS = (
+    func.sum(LLMUsage.calls).label("calls"),
+    func.sum(LLMUsage.prompt_tokens).label("prompt_tokens"),
+    func.sum(LLMUsage.cached_tokens).label("cached_tokens"),
+    func.sum(LLMUsage.completion_tokens).label("completion_tokens"),
+    func.sum(LLMUsage.latency_ms_total).label("latency_ms_total"),
+    func.max(LLMUsage.latency_ms_max).label("latency_ms_max"),
+)
+
+
+def _filters(
+    tenant_id: Optional[int], date_from: Optional[date], date_to: Optional[date]
+):
+    conditions = []
+    if tenant_id is not None:
+        conditions.append(LLMUsage.tenant_id == tenant_id)
+    if date_from:
+        conditions.append(LLMUsage.day >= date_from)
+    if date_to:
+        conditions.append(LLMUsage.day <= date_to)
+    return conditions
+
+
+@router.get("/")
+async def get_usage(
+    tenant_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Consumo de OpenAI (llamadas, tokens y latencia) por tenant, día y modelo.
+    """
+    await usage_tracker.flush()
+
+    result = await db.execute(
+        select(LLMUsage.tenant_id, LLMUsage.day, LLMUsage.model, *TOTALS)
+        .where(*_filters(tenant_id, date_from, date_to))
+        .group_by(LLMUsage.tenant_id, LLMUsage.day, LLMUsage.model)
+        .order_by(LLMUsage.day.desc(), LLMUsage.tenant_id, LLMUsage.model)
+    )
+    return [dict(row._mapping) for row in result]
+
+
+@router.get("/sessions")
+async def get_session_usage(
+    tenant_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    order_by: str = Query("tokens", pattern="^(tokens|latency)$"),
+    limit: int = Query(20, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Sesiones que más tokens o más tiempo de OpenAI consumen.
+    """
+    await usage_tracker.flush()
+
+    tokens = func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens)
+    latency = func.sum(LLMUsage.latency_ms_total)
+
+    result = await db.execute(
+        select(
+            LLMUsage.tenant_id,
+            LLMUsage.session_id,
+            tokens.label("total_tokens"),
+            *TOTALS,
+        )
+        .where(*_filters(tenant_id, date_from, date_to))
+        .group_by(LLMUsage.tenant_id, LLMUsage.session_id)
+        .order_by((tokens if order_by == "tokens" else latency).desc())
+        .limit(limit)
+    )
+    return [dict(row._mapping) for row in result]
@@ -5,44 +5,22 @@ from fastapi import APIRouter, Request, HTTPException
 from fastapi import Depends
 from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
 from app.core.config import settings
 from app.core.dependencies import get_db
-from app.models.tenants import Tenant
-from app.models.whatsapp import ProcessedMessage
 from app.schemas.whatsapp import WhatsAppPayload
-from app.services.database_service import DatabaseService
-from app.services.whatsapp_service import (
-    process_whatsapp_message,
-    send_message,
-)
+from app.services.conversation_scheduler_service import conversation_scheduler
+from app.services.dedup_service import message_deduplicator
+from app.services.message_queue_service import enqueue_message, message_queue
+from app.services.tenant_registry_service import tenant_registry
+from app.services.tenant_service import get_message_coalesce_ms
+from app.services.outbound_service import outbound_dispatcher
+from app.services.whatsapp_service import MessageJob
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-async def is_message_processed(
-    db: AsyncSession, message_id: str, tenant_id: int
-) -> bool:
-    """
-    Verifica si un mensaje ya fue procesado, filtrando por tenant_id.
-    """
-    result = await db.execute(
-        select(ProcessedMessage).filter_by(message_id=message_id, tenant_id=tenant_id)
-    )
-    return result.scalars().first() is not None
-
-
-async def mark_message_as_processed(db: AsyncSession, message_id: str, tenant_id: int):
-    """
-    Marca un mensaje como procesado y lo asocia con un tenant específico.
-    """
-    processed_message = ProcessedMessage(message_id=message_id, tenant_id=tenant_id)
-    db.add(processed_message)
-    await db.commit()
-
-
 async def get_tenant_id(db: AsyncSession, to_number: str, from_number: str) -> int:
     """
     Obtiene el tenant_id asociado a un número de teléfono.
@@ -50,13 +28,12 @@ async def get_tenant_id(db: AsyncSession, to_number: str, from_number: str) -> i
     if from_number == "34623288679":
         to_number = "15551750561_test"
 
-    result = await db.execute(select(Tenant.id).where(Tenant.phone_number == to_number))
-    tenant_id = result.scalar_one_or_none()
+    tenant = await tenant_registry.get_by_phone(db, to_number)
 
-    if not tenant_id:
+    if not tenant:
         raise HTTPException(status_code=404, detail="Tenant no encontrado")
 
-    return tenant_id
+    return tenant.id
 
 
 @router.post("/webhook")
@@ -66,9 +43,13 @@ async def whatsapp_webhook(
 ):
     """
     Endpoint para manejar mensajes entrantes de WhatsApp.
+
+    En modo "queue" los mensajes se guardan en la cola duradera y se responde
+    200 sin esperar a la IA; los workers iniciados en `lifespan` los procesan.
     """
     try:
-        tasks = []
+        queued = settings.WHATSAPP_INGESTION_MODE == "queue"
+        candidates = []
         for entry in payload.entry:
             for change in entry.changes:
                 value = change.value
@@ -88,8 +69,6 @@ async def whatsapp_webhook(
 
                     # 📌 Obtener el ID del mensaje
                     message_id = message.get("id")
-                    if await is_message_processed(db, message_id, tenant_id):
-                        continue  # Skip already processed messages
 
                     # Verificar si el mensaje es un mensaje de texto
                     if "text" in message:
@@ -106,13 +85,52 @@ async def whatsapp_webhook(
                     else:
                         continue
 
-                    # ✅ Crear tareas para procesar cada mensaje, incluyendo el `tenant_id`
-                    tasks.append(
-                        process_whatsapp_message(
-                            from_number, message_body, tenant_id, db
-                        )
+                    candidates.append(
+                        (message_id, from_number, message_body, tenant_id)
                     )
-                    await mark_message_as_processed(db, message_id, tenant_id)
+
+        # 🔍 Descartar reentregas con un único INSERT ... ON CONFLICT por lote
+        accepted = await message_deduplicator.claim(
+            db, [(message_id, tenant_id) for message_id, _, _, tenant_id in candidates]
+        )
+        # Un mismo WAMID repetido dentro del lote solo se procesa una vez
+        accepted_messages, seen = [], set()
+        for candidate in candidates:
+            message_id = candidate[0]
+            if message_id in accepted and message_id not in seen:
+                seen.add(message_id)
+                accepted_messages.append(candidate)
+
+        try:
+            if queued:
+                # 📥 Encolar; se confirma junto con el marcado de procesado
+                for message_id, from_number, body, tenant_id in accepted_messages:
+                    await enqueue_message(db, message_id, from_number, body, tenant_id)
+            await db.commit()
+
+        except Exception:
+            await db.rollback()
+            message_deduplicator.release(accepted)
+            raise
+
+        message_deduplicator.confirm(accepted)
+
+        if queued:
+            message_queue.notify()
+            return JSONResponse(status_code=200, content={"status": "success"})
+
+        # ✅ Crear tareas para procesar cada mensaje, incluyendo el `tenant_id`
+        # (en orden por cliente, con su propia sesión de BD y agrupando
+        # ráfagas si el tenant tiene ventana de agrupación)
+        tasks = []
+        for _, from_number, message_body, tenant_id in accepted_messages:
+            job = MessageJob(
+                from_number,
+                [message_body],
+                tenant_id,
+                coalesce_ms=await get_message_coalesce_ms(db, tenant_id),
+            )
+            tasks.append(conversation_scheduler.submit(tenant_id, from_number, job))
 
         # 🚀 Ejecutar todas las tareas en paralelo
         await asyncio.gather(*tasks)
@@ -124,18 +142,17 @@ async def whatsapp_webhook(
         raise HTTPException(status_code=400, detail="Error procesando el evento")
 
 
-@router.post("/send")
-async def send_whatsapp_message(
-    to: str, body: str, tenant_id: int, db: AsyncSession = Depends(get_db)
-):
+@router.post("/send", status_code=202)
+async def send_whatsapp_message(to: str, body: str, tenant_id: int):
     """
     Endpoint para enviar mensajes de WhatsApp.
+
+    El mensaje se encola en el despachador de salida, que respeta el orden por
+    destinatario, el límite de envío del tenant y reintenta los 429/5xx. Se
+    responde 202: el envío ocurre después y puede fallar definitivamente.
     """
-    db_service = DatabaseService()
-    db = await db_service.get_session()
-    
-    await send_message(to, body, tenant_id, db)
-    return {"message": "Mensaje enviado correctamente"}
+    outbound_dispatcher.enqueue(tenant_id, to, body)
+    return {"message": "Mensaje aceptado, se enviará en segundo plano"}
 
 
 @router.get("/webhook")
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
 
 
@@ -24,3 +24,51 @@ class CategorySchema(BaseModel):
 class MenuSchema(BaseModel):
     tenant_id: int = Field(..., example=1)
     categories: List[CategorySchema]
+
+
+class ItemPatchSchema(BaseModel):
+    """
+    Cambio de un plato, identificado por `id` o por `name` (y opcionalmente
+    `category`, si el mismo nombre existe en varias categorías).
+    """
+
+    id: Optional[int] = Field(None, example=12)
+    name: Optional[str] = Field(None, example="Coca Cola")
+    category: Optional[str] = Field(None, example="Bebidas")
+    price: Optional[float] = Field(None, example=2.5)
+    available: Optional[bool] = Field(None, example=False)
+
+    @model_validator(mode="after")
+    def check_target_and_change(self):
+        if self.id is None and not self.name:
+            raise ValueError("Indica el id o el nombre del plato")
+        if self.price is None and self.available is None:
+            raise ValueError("Indica el precio o la disponibilidad")
+        return self
+
+
+class ExtraPatchSchema(BaseModel):
+    """
+    Cambio de un extra, identificado por `id` o por `name` (y opcionalmente
+    `item`, el nombre del plato al que pertenece).
+    """
+
+    id: Optional[int] = Field(None, example=7)
+    name: Optional[str] = Field(None, example="Salsa de Queso")
+    item: Optional[str] = Field(None, example="Hamburguesa Clásica")
+    price: Optional[float] = Field(None, example=1.8)
+    available: Optional[bool] = Field(None, example=False)
+
+    @model_validator(mode="after")
+    def check_target_and_change(self):
+        if self.id is None and not self.name:
+            raise ValueError("Indica el id o el nombre del extra")
+        if self.price is None and self.available is None:
+            raise ValueError("Indica el precio o la disponibilidad")
+        return self
+
+
+class MenuPatchSchema(BaseModel):
+    tenant_id: int = Field(..., example=1)
+    items: List[ItemPatchSchema] = []
+    extras: List[ExtraPatchSchema] = []
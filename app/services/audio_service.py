@@ -0,0 +1,157 @@
+import asyncio
+import logging
+
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.http_client_service import get_http_client
+from app.services.openai_client_service import TRANSCRIPTION_MODEL, call_openai
+from app.services.tenant_service import get_whatsapp_token
+from app.services.transcription_cache_service import (
+    hash_audio,
+    transcription_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AudioTooLargeError(Exception):
+    """
+    El audio supera `AUDIO_MAX_BYTES`.
+    """
+
+
+class TranscriptionPool:
+    """
+    Pool acotado de transcripciones con Whisper.
+
+    Como mucho `max_workers` transcripciones a la vez, y un semáforo por
+    tenant evita que un solo restaurante ocupe todo el pool. Las llamadas
+    pasan además por el limitador global de OpenAI.
+    """
+
+    def __init__(self, max_workers: int, per_tenant: int):
+        self.max_workers = max_workers
+        self.per_tenant = per_tenant
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self._tenant_limits: Dict[int, asyncio.Semaphore] = {}
+
+    def _tenant_limit(self, tenant_id: int) -> asyncio.Semaphore:
+        if tenant_id not in self._tenant_limits:
+            self._tenant_limits[tenant_id] = asyncio.Semaphore(self.per_tenant)
+        return self._tenant_limits[tenant_id]
+
+    async def transcribe(
+        self, tenant_id: int, audio: bytes, filename: str, session_id: int = None
+    ) -> str:
+        async with self._tenant_limit(tenant_id), self._semaphore:
+            transcription = await call_openai(
+                lambda client: client.audio.transcriptions.create(
+                    model=TRANSCRIPTION_MODEL, file=(filename, audio)
+                ),
+                model=TRANSCRIPTION_MODEL,
+                tenant_id=tenant_id,
+                session_id=session_id,
+            )
+        return transcription.text.strip()
+
+
+# Instancia global del pool de transcripción
+transcription_pool = TranscriptionPool(
+    max_workers=settings.TRANSCRIPTION_MAX_CONCURRENCY,
+    per_tenant=settings.TRANSCRIPTION_PER_TENANT_CONCURRENCY,
+)
+
+
+async def get_audio_url(media_id: str, tenant_id: int, db: AsyncSession) -> str:
+    """
+    Obtiene la URL de descarga del archivo de audio desde WhatsApp API.
+    """
+    try:
+        whatsapp_token = await get_whatsapp_token(db, tenant_id)
+
+        url = f"https://graph.facebook.com/{settings.WHATSAPP_VERSION_API}/{media_id}"
+        headers = {"Authorization": f"Bearer {whatsapp_token}"}
+
+        response = await get_http_client().get(url, headers=headers)
+        response_data = response.json()
+
+        if response.status_code != 200:
+            logger.error(f"❌ Error obteniendo URL del audio: {response_data}")
+            return None
+
+        audio_url = response_data.get("url")
+
+        return audio_url
+
+    except Exception as e:
+        logger.error(f"❌ Excepción en get_audio_url: {e}", exc_info=True)
+        return None
+
+
+async def download_audio(audio_url: str, whatsapp_token: str) -> Optional[bytes]:
+    """
+    Descarga el audio en memoria por streaming, cortando la descarga si supera
+    `AUDIO_MAX_BYTES`. No escribe nada en disco.
+    """
+    max_bytes = settings.AUDIO_MAX_BYTES
+    headers = {"Authorization": f"Bearer {whatsapp_token}"}
+
+    async with get_http_client().stream("GET", audio_url, headers=headers) as response:
+        if response.status_code != 200:
+            logger.error(f"❌ Error al descargar el audio: {response.status_code}")
+            return None
+
+        declared = int(response.headers.get("Content-Length") or 0)
+        if declared > max_bytes:
+            raise AudioTooLargeError(f"{declared} bytes (máximo {max_bytes})")
+
+        buffer = bytearray()
+        async for chunk in response.aiter_bytes():
+            buffer.extend(chunk)
+            if len(buffer) > max_bytes:
+                raise AudioTooLargeError(f"más de {max_bytes} bytes")
+
+    return bytes(buffer)
+
+
+async def transcribe_audio(
+    audio_url: str,
+    tenant_id: int,
+    db: AsyncSession,
+    media_id: str = None,
+    session_id: int = None,
+) -> str:
+    """
+    Transcribe un archivo de audio a texto utilizando OpenAI Whisper.
+    Si ya se transcribió un audio con el mismo contenido, reutiliza el texto.
+    """
+    try:
+        whatsapp_token = await get_whatsapp_token(db, tenant_id)
+
+        # Descargar el archivo de audio con autenticación
+        audio = await download_audio(audio_url, whatsapp_token)
+        if not audio:
+            return None
+
+        content_hash = hash_audio(audio)
+        cached = await transcription_cache.get_by_hash(db, content_hash, media_id)
+        if cached is not None:
+            return cached
+
+        # Enviar a OpenAI Whisper directamente desde memoria
+        text = await transcription_pool.transcribe(
+            tenant_id, audio, "audio.ogg", session_id=session_id
+        )
+        await transcription_cache.put(db, tenant_id, media_id, content_hash, text)
+        return text
+
+    except AudioTooLargeError as e:
+        logger.error(f"❌ Audio demasiado grande, se descarta: {e}")
+        return None
+
+    except Exception as e:
+        logger.error(f"❌ Error transcribiendo el audio: {e}", exc_info=True)
+        return None
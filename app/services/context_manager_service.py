@@ -1,62 +1,250 @@
+import asyncio
 import json
+import logging
+from collections import OrderedDict
+from typing import Iterable, Optional, Set
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.dependencies import async_session
 from app.models.sessions import Session
+from app.services.menu_snapshot_service import MenuSnapshot
 
+logger = logging.getLogger(__name__)
 
-async def initialize_context(menu: dict) -> str:
+
+async def initialize_context(snapshot: MenuSnapshot) -> str:
     """
     Inicializa el contexto de la conversación.
     """
-    if "menu" in menu:  # Evita duplicar la clave "menu"
-        menu_data = menu["menu"]
-    else:
-        menu_data = menu
-
     return json.dumps(
         {
-            "menu": menu_data,  # Para guardar el menú actual
-            "conversation": [],  # Para guardar la conversación
+            "menu_version_id": snapshot.id,  # Versión del menú (menu_versions)
             "current_order": None,  # Para guardar el pedido actual
+            "summarized_seq": 0,  # Último turno incluido en el resumen
         }
     )
 
 
-async def get_context(session_id: int, tenant_id: int, db: AsyncSession) -> dict:
+class SessionContextCache:
     """
-    Obtiene el contexto de la conversación.
+    Caché write-behind de los contextos de sesión ya decodificados.
+
+    - `get_context` devuelve el dict en memoria: sin SELECT ni `json.loads`
+      en cada mensaje (`get_or_create_session` lo precarga con `prime`).
+    - `update_context` modifica el dict y marca la sesión como pendiente; las
+      escrituras se agrupan y se vuelcan en segundo plano, todas en un solo
+      UPDATE por lotes, `flush_delay_seconds` después del primer cambio.
+    - LRU de `max_size` sesiones: solo se desalojan contextos ya guardados.
+
+    Como el planificador de conversaciones, asume que todos los mensajes de
+    una conversación se procesan en el mismo proceso.
     """
-    result = await db.execute(
-        select(Session).filter(
-            Session.id == session_id, Session.active, Session.tenant_id == tenant_id
+
+    def __init__(self, max_size: int, flush_delay_seconds: float):
+        self.max_size = max_size
+        self.flush_delay_seconds = flush_delay_seconds
+        self._entries: OrderedDict = OrderedDict()  # session_id -> contexto
+        self._dirty: Set[int] = set()
+        self._flushing: Set[int] = set()  # Contextos con un UPDATE en curso
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+
+    def _store(self, session_id: int, context: dict) -> dict:
+        self._entries[session_id] = context
+        self._entries.move_to_end(session_id)
+        self._evict()
+        return context
+
+    def _evict(self):
+        overflow = len(self._entries) - self.max_size
+        if overflow <= 0:
+            return
+
+        for session_id in list(self._entries):
+            if overflow <= 0:
+                break
+            if session_id not in self._dirty and session_id not in self._flushing:
+                del self._entries[session_id]
+                overflow -= 1
+
+        if overflow > 0:
+            # Solo quedan contextos sin guardar: volcarlos cuanto antes
+            self._schedule_flush(delay=0)
+
+    def prime(self, session: Session) -> dict:
+        """
+        Decodifica el contexto de una sesión recién leída, salvo que ya esté
+        en caché (la copia en memoria puede ser más reciente que la de la BD).
+
+        La versión del menú manda la columna `menu_version_id`: `patch_menu`
+        la cambia en todas las sesiones activas sin tocar sus contextos.
+        """
+        if session.id in self._entries:
+            self._entries.move_to_end(session.id)
+            context = self._entries[session.id]
+        else:
+            context = self._store(session.id, json.loads(session.context or "{}"))
+
+        if (
+            session.menu_version_id is not None
+            and context.get("menu_version_id") != session.menu_version_id
+        ):
+            context["menu_version_id"] = session.menu_version_id
+            self._dirty.add(session.id)
+            self._schedule_flush(self.flush_delay_seconds)
+        return context
+
+    async def get(self, session_id: int, tenant_id: int, db: AsyncSession) -> dict:
+        if session_id in self._entries:
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return self._entries[session_id]
+
+        self.misses += 1
+        result = await db.execute(
+            select(Session).filter(
+                Session.id == session_id, Session.active, Session.tenant_id == tenant_id
+            )
         )
-    )
-    session = result.scalar()
+        session = result.scalar()
+        if not session:
+            return {}
+        return self.prime(session)
+
+    async def update(
+        self, session_id: int, new_context: dict, tenant_id: int, db: AsyncSession
+    ):
+        context = await self.get(session_id, tenant_id, db)
+        if not context and session_id not in self._entries:
+            return  # Sesión inexistente o cerrada
+
+        context.update(new_context)
+        self._dirty.add(session_id)
+        self._schedule_flush(self.flush_delay_seconds)
 
-    if session:
-        return json.loads(session.context or "{}")
+    def _schedule_flush(self, delay: float):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush(delay))
 
-    return {}
+    async def _delayed_flush(self, delay: float):
+        await asyncio.sleep(delay)
+        # Mientras esta tarea corre, `_schedule_flush` no crea otra: los
+        # cambios que lleguen durante la escritura (o un fallo de la BD) se
+        # vuelcan aquí mismo en la siguiente pasada
+        while True:
+            await self.flush()
+            if not self._dirty:
+                return
+            await asyncio.sleep(self.flush_delay_seconds)
+
+    async def flush(self, session_ids: Optional[Iterable[int]] = None):
+        """
+        Guarda los contextos pendientes (todos o solo `session_ids`) con un
+        único UPDATE por lotes.
+        """
+        async with self._lock:
+            pending = (
+                self._dirty if session_ids is None else self._dirty & set(session_ids)
+            )
+            rows = [
+                {"id": session_id, "context": json.dumps(self._entries[session_id])}
+                for session_id in pending
+                if session_id in self._entries
+            ]
+            if not rows:
+                return
+
+            # Se desmarcan antes de escribir: si un contexto cambia durante el
+            # UPDATE vuelve a quedar pendiente y no se pierde
+            flushed = {row["id"] for row in rows}
+            self._dirty -= flushed
+            self._flushing = flushed
+            try:
+                # Solo sesiones activas: el reaper puede haber cerrado y
+                # archivado una sesión después de que su contexto cambiara
+                async with async_session() as db:
+                    await db.execute(
+                        update(Session)
+                        .where(Session.active)
+                        .execution_options(synchronize_session=None),
+                        rows,
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"❌ Error guardando contextos de sesión: {e}")
+                # Vuelven a pendientes, salvo los que se sacaron de la caché
+                self._dirty |= flushed & self._entries.keys()
+                self._schedule_flush(self.flush_delay_seconds)
+                return
+            finally:
+                self._flushing = set()
+
+            self.flushes += 1
+            self._evict()
+
+    async def discard(self, session_id: int):
+        """
+        Guarda el contexto pendiente de una sesión y la saca de la caché
+        (se usa al cerrar la sesión).
+        """
+        await self.flush([session_id])
+        self._entries.pop(session_id, None)
+        self._dirty.discard(session_id)
+
+    def forget(self, session_ids: Iterable[int]):
+        """
+        Saca sesiones de la caché sin guardar nada (sesiones ya cerradas y
+        archivadas por el reaper).
+        """
+        for session_id in session_ids:
+            self._entries.pop(session_id, None)
+            self._dirty.discard(session_id)
+
+    async def close(self):
+        """
+        Vuelca todo lo pendiente (se llama desde `lifespan` al apagar).
+        """
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
+        if self._dirty:
+            logger.warning(f"⚠️ {len(self._dirty)} contextos de sesión sin guardar.")
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._entries),
+            "dirty": len(self._dirty),
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushes": self.flushes,
+        }
+
+
+# Instancia global de la caché de contextos de sesión
+session_context_cache = SessionContextCache(
+    max_size=settings.CONTEXT_CACHE_SIZE,
+    flush_delay_seconds=settings.CONTEXT_FLUSH_DELAY_SECONDS,
+)
+
+
+async def get_context(session_id: int, tenant_id: int, db: AsyncSession) -> dict:
+    """
+    Obtiene el contexto de la conversación.
+    """
+    return await session_context_cache.get(session_id, tenant_id, db)
 
 
 async def update_context(
     session_id: int, new_context: dict, tenant_id: int, db: AsyncSession
 ):
     """
-    Actualiza el contexto de la conversación.
+    Actualiza el contexto de la conversación (se guarda en segundo plano).
     """
-    result = await db.execute(
-        select(Session).filter(
-            Session.id == session_id, Session.active, Session.tenant_id == tenant_id
-        )
-    )
-    session = result.scalar()
-
-    if session:
-        context = json.loads(session.context or "{}")
-        context.update(new_context)
-        session.context = json.dumps(context)
-        await db.commit()
-        await db.refresh(session)
+    await session_context_cache.update(session_id, new_context, tenant_id, db)
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.dependencies import async_session
+
+logger = logging.getLogger(__name__)
+
+ConversationKey = Tuple[int, str]
+ConversationJob = Callable[[AsyncSession], Awaitable[Any]]
+
+# Tope de espera de una ráfaga, en múltiplos de la ventana de agrupación
+COALESCE_MAX_WINDOWS = 3
+
+
+class ConversationScheduler:
+    """
+    Ejecuta trabajos por conversación (tenant_id, from_number).
+
+    Los mensajes de un mismo cliente se procesan estrictamente en orden de
+    llegada; los de clientes distintos se ejecutan en paralelo, con un límite
+    global de conversaciones simultáneas. Cada trabajo recibe su propia
+    sesión de base de datos, de modo que nunca se comparte un `AsyncSession`
+    entre corrutinas concurrentes.
+
+    Los trabajos con atributo `coalesce_ms` > 0 que exponen `can_merge` y
+    `merge` (ver `MessageJob`) se agrupan: el runner espera a que la
+    conversación lleve `coalesce_ms` sin mensajes nuevos y ejecuta todos los
+    pendientes fusionados en un solo trabajo.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queues: Dict[ConversationKey, Deque] = {}
+        self._arrivals: Dict[ConversationKey, asyncio.Event] = {}
+        self._runners: Dict[ConversationKey, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def submit(
+        self, tenant_id: int, from_number: str, job: ConversationJob
+    ) -> asyncio.Future:
+        """
+        Encola un trabajo para la conversación y devuelve un futuro con su
+        resultado. `job` recibe la sesión de base de datos como único argumento.
+        """
+        key = (tenant_id, from_number)
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append((job, future))
+        self._arrivals.setdefault(key, asyncio.Event()).set()
+
+        if key not in self._runners:
+            self._runners[key] = asyncio.create_task(self._drain(key))
+
+        return future
+
+    def pending(self) -> int:
+        """
+        Número de trabajos encolados que aún no han empezado.
+        """
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> dict:
+        return {
+            "active_conversations": len(self._runners),
+            "pending_jobs": self.pending(),
+            "coalesced_messages": self.coalesced,
+        }
+
+    async def close(self):
+        """
+        Cancela las conversaciones en curso (se usa al apagar la aplicación).
+        """
+        runners = list(self._runners.values())
+        for runner in runners:
+            runner.cancel()
+        await asyncio.gather(*runners, return_exceptions=True)
+
+    async def _wait_for_quiet(self, key: ConversationKey, window_ms: int):
+        """
+        Espera hasta que la conversación pase `window_ms` sin mensajes nuevos,
+        con un máximo de `COALESCE_MAX_WINDOWS` ventanas.
+        """
+        loop = asyncio.get_running_loop()
+        window = window_ms / 1000
+        deadline = loop.time() + window * COALESCE_MAX_WINDOWS
+        arrivals = self._arrivals[key]
+
+        while True:
+            arrivals.clear()
+            timeout = min(window, deadline - loop.time())
+            if timeout <= 0:
+                return
+            try:
+                await asyncio.wait_for(arrivals.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return
+
+    def _take_batch(self, queue: Deque, job, future) -> Tuple[Any, list]:
+        """
+        Saca de la cola los trabajos consecutivos que se pueden fusionar con `job`.
+        """
+        jobs, futures = [job], [future]
+        while queue and job.can_merge(queue[0][0]):
+            next_job, next_future = queue.popleft()
+            jobs.append(next_job)
+            futures.append(next_future)
+
+        if len(jobs) > 1:
+            self.coalesced += len(jobs) - 1
+            job = job.merge(jobs)
+
+        return job, futures
+
+    async def _drain(self, key: ConversationKey):
+        queue = self._queues[key]
+        try:
+            while queue:
+                job, future = queue.popleft()
+                futures = [future]
+
+                if getattr(job, "coalesce_ms", 0) > 0:
+                    await self._wait_for_quiet(key, job.coalesce_ms)
+                    job, futures = self._take_batch(queue, job, future)
+
+                async with self._semaphore:
+                    try:
+                        async with async_session() as db:
+                            result = await job(db)
+                        for future in futures:
+                            if not future.done():
+                                future.set_result(result)
+
+                    except Exception as e:
+                        logger.error(
+                            f"❌ Error en la conversación {key}: {e}", exc_info=True
+                        )
+                        for future in futures:
+                            if not future.done():
+                                future.set_exception(e)
+
+        finally:
+            # Sin `await` entre el último `popleft` y aquí: ningún `submit`
+            # puede colarse en una cola que ya no tiene runner.
+            for job, future in queue:
+                future.cancel()
+            self._queues.pop(key, None)
+            self._arrivals.pop(key, None)
+            self._runners.pop(key, None)
+
+
+# Instancia global del planificador de conversaciones
+conversation_scheduler = ConversationScheduler(
+    max_concurrency=settings.WHATSAPP_WORKERS
+)
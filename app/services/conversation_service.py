@@ -0,0 +1,129 @@
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, List
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.sessions import ConversationTurn
+
+logger = logging.getLogger(__name__)
+
+
+def _turn_dict(seq: int, user_message: str, bot_response: str) -> Dict:
+    return {"seq": seq, "user": user_message, "bot": bot_response}
+
+
+class ConversationTurnStore:
+    """
+    Historial de conversación como filas `conversation_turns` de solo inserción.
+
+    - `append` guarda un turno con un único INSERT ... SELECT que calcula el
+      siguiente `seq` de la sesión en la propia base de datos.
+    - `recent` devuelve los últimos turnos con una consulta de rango sobre el
+      índice (session_id, seq). Se guarda en memoria una ventana de los
+      últimos `window` turnos por sesión (LRU de `max_sessions`), así que en
+      una conversación activa no hace falta ni esa consulta.
+    """
+
+    def __init__(self, window: int, max_sessions: int):
+        self.window = window
+        self.max_sessions = max_sessions
+        self._windows: OrderedDict = OrderedDict()  # session_id -> deque
+
+    def _remember(self, session_id: int, turns: List[Dict]):
+        self._windows[session_id] = deque(turns, maxlen=self.window)
+        self._windows.move_to_end(session_id)
+        while len(self._windows) > self.max_sessions:
+            self._windows.popitem(last=False)
+
+    async def append(
+        self,
+        db: AsyncSession,
+        session_id: int,
+        tenant_id: int,
+        user_message: str,
+        bot_response: str,
+    ) -> int:
+        """
+        Inserta el turno y devuelve su número de secuencia.
+        """
+        next_seq = select(
+            literal(tenant_id),
+            literal(session_id),
+            func.coalesce(func.max(ConversationTurn.seq), 0) + 1,
+            literal(user_message),
+            literal(bot_response),
+        ).where(ConversationTurn.session_id == session_id)
+
+        result = await db.execute(
+            insert(ConversationTurn)
+            .from_select(
+                ["tenant_id", "session_id", "seq", "user_message", "bot_response"],
+                next_seq,
+            )
+            .returning(ConversationTurn.seq)
+        )
+        seq = result.scalar_one()
+        await db.commit()
+
+        if session_id in self._windows:
+            self._windows[session_id].append(
+                _turn_dict(seq, user_message, bot_response)
+            )
+            self._windows.move_to_end(session_id)
+        return seq
+
+    async def recent(self, db: AsyncSession, session_id: int) -> List[Dict]:
+        """
+        Últimos `window` turnos de la sesión, del más antiguo al más reciente.
+        """
+        if session_id in self._windows:
+            self._windows.move_to_end(session_id)
+            return list(self._windows[session_id])
+
+        result = await db.execute(
+            select(
+                ConversationTurn.seq,
+                ConversationTurn.user_message,
+                ConversationTurn.bot_response,
+            )
+            .where(ConversationTurn.session_id == session_id)
+            .order_by(ConversationTurn.seq.desc())
+            .limit(self.window)
+        )
+        turns = [_turn_dict(*row) for row in reversed(result.all())]
+        self._remember(session_id, turns)
+        return turns
+
+    async def between(
+        self, db: AsyncSession, session_id: int, after_seq: int, upto_seq: int
+    ) -> List[Dict]:
+        """
+        Turnos con `after_seq` < seq <= `upto_seq`, en orden.
+        """
+        result = await db.execute(
+            select(
+                ConversationTurn.seq,
+                ConversationTurn.user_message,
+                ConversationTurn.bot_response,
+            )
+            .where(
+                ConversationTurn.session_id == session_id,
+                ConversationTurn.seq > after_seq,
+                ConversationTurn.seq <= upto_seq,
+            )
+            .order_by(ConversationTurn.seq)
+        )
+        return [_turn_dict(*row) for row in result.all()]
+
+    def discard(self, session_id: int):
+        self._windows.pop(session_id, None)
+
+
+# Instancia global del almacén de turnos
+turn_store = ConversationTurnStore(
+    window=settings.HISTORY_KEEP_TURNS + settings.HISTORY_SUMMARY_BATCH,
+    max_sessions=settings.CONTEXT_CACHE_SIZE,
+)
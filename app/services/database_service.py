@@ -1,3 +1,4 @@
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.dependencies import get_db
 
@@ -14,3 +15,13 @@ class DatabaseService:
         if self.db_session is None:
             await self.init_session()
         return self.db_session
+
+
+def dialect_insert(db: AsyncSession, table):
+    """
+    Devuelve un `insert` del dialecto activo (PostgreSQL o SQLite) para poder
+    usar `on_conflict_do_nothing` / `on_conflict_do_update`.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
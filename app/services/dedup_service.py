@@ -0,0 +1,103 @@
+import logging
+from collections import OrderedDict
+from typing import Iterable, List, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.whatsapp import ProcessedMessage
+from app.services.database_service import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+
+class MessageDeduplicator:
+    """
+    Filtra reentregas de webhooks de WhatsApp por WAMID (ID de mensaje).
+
+    Tres niveles, del más barato al más caro:
+    1. LRU acotado en memoria con los WAMID vistos recientemente.
+    2. Conjunto "en vuelo" con los WAMID reclamados cuyo commit aún no se ha
+       hecho, para atrapar reentregas concurrentes.
+    3. Un único `INSERT ... ON CONFLICT DO NOTHING RETURNING` por lote contra
+       `processed_messages`: solo se procesan las filas que se insertan.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._recent: OrderedDict = OrderedDict()
+        self._in_flight: Set[str] = set()
+
+    def _remember(self, message_ids: Iterable[str]):
+        for message_id in message_ids:
+            self._recent[message_id] = None
+            self._recent.move_to_end(message_id)
+        while len(self._recent) > self.max_size:
+            self._recent.popitem(last=False)
+
+    async def claim(
+        self, db: AsyncSession, candidates: List[Tuple[str, int]]
+    ) -> Set[str]:
+        """
+        Reclama un lote de mensajes (message_id, tenant_id) y devuelve los
+        message_id nuevos. No hace commit: el llamador debe confirmar la
+        transacción y después llamar a `confirm` (o a `release` si falla).
+        """
+        fresh = {}
+        for message_id, tenant_id in candidates:
+            if message_id in self._recent:
+                self._recent.move_to_end(message_id)
+                continue
+            if message_id in self._in_flight or message_id in fresh:
+                continue
+            fresh[message_id] = tenant_id
+
+        if not fresh:
+            return set()
+
+        self._in_flight.update(fresh)
+        try:
+            result = await db.execute(
+                dialect_insert(db, ProcessedMessage)
+                .values(
+                    [
+                        {"message_id": message_id, "tenant_id": tenant_id}
+                        for message_id, tenant_id in fresh.items()
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=["message_id"])
+                .returning(ProcessedMessage.message_id)
+            )
+            accepted = set(result.scalars().all())
+
+        except Exception:
+            self.release(fresh)
+            raise
+
+        # Los que chocaron ya estaban en BD: se recuerdan sin procesarlos
+        rejected = set(fresh) - accepted
+        self._in_flight.difference_update(rejected)
+        self._remember(rejected)
+
+        if rejected:
+            logger.info(f"🔁 {len(rejected)} mensajes duplicados descartados.")
+
+        return accepted
+
+    def confirm(self, message_ids: Iterable[str]):
+        """
+        Marca como vistos los mensajes reclamados tras el commit.
+        """
+        message_ids = list(message_ids)
+        self._in_flight.difference_update(message_ids)
+        self._remember(message_ids)
+
+    def release(self, message_ids: Iterable[str]):
+        """
+        Libera mensajes reclamados cuya transacción se revirtió.
+        """
+        self._in_flight.difference_update(message_ids)
+
+
+# Instancia global del deduplicador
+message_deduplicator = MessageDeduplicator(max_size=settings.DEDUP_CACHE_SIZE)
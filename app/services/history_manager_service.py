@@ -0,0 +1,247 @@
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.conversation_service import turn_store
+from app.services.openai_client_service import CHAT_MODEL, call_openai
+from app.services.tenant_registry_service import tenant_registry
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - dependencia opcional
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Tokens de formato que añade la API por cada mensaje del chat
+TOKENS_PER_MESSAGE = 4
+
+SUMMARY_INSTRUCTIONS = (
+    "Resume la conversación entre un cliente y el camarero virtual de un "
+    "restaurante en pocas frases. Conserva siempre: número de mesa, idioma "
+    "del cliente, platos y bebidas pedidos o en discusión (con cantidades, "
+    "extras y modificaciones), preferencias o alergias y si el pedido ya se "
+    "confirmó. No inventes nada."
+)
+
+_encoding = None
+_encoding_failed = False
+
+
+def load_tokenizer():
+    """
+    Carga el tokenizador local una sola vez (se precarga desde `lifespan`,
+    ya que la primera carga puede descargar el vocabulario). Si no está
+    instalado o no se puede cargar, se usa una estimación por longitud.
+    """
+    global _encoding, _encoding_failed
+    if tiktoken is None:
+        return None
+    if _encoding is None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(settings.TOKENIZER_ENCODING)
+        except Exception as e:
+            _encoding_failed = True
+            logger.warning(f"⚠️ Tokenizador no disponible, se estiman tokens: {e}")
+    return _encoding
+
+
+@lru_cache(maxsize=1024)
+def count_tokens(text: str) -> int:
+    """
+    Número de tokens de un texto (estimado a ~4 caracteres por token si no
+    hay tokenizador).
+    """
+    encoding = load_tokenizer()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(
+        count_tokens(message["content"]) + TOKENS_PER_MESSAGE for message in messages
+    )
+
+
+def turns_to_messages(turns: List[Dict]) -> List[Dict[str, str]]:
+    messages = []
+    for entry in turns:
+        messages.append({"role": "user", "content": entry["user"]})
+        messages.append({"role": "assistant", "content": entry["bot"]})
+    return messages
+
+
+class HistoryManager:
+    """
+    Historial de conversación acotado por tokens.
+
+    Los turnos se guardan en `conversation_turns` (ver `turn_store`); en el
+    contexto de la sesión solo quedan el resumen y hasta qué turno cubre
+    (`summarized_seq`).
+
+    - Los últimos `keep_turns` turnos se envían literales.
+    - Cuando hay `summary_batch` turnos más antiguos sin resumir, se resumen
+      junto con el resumen anterior (`context["summary"]`): el resumen se
+      actualiza cada pocos turnos, no en todos.
+    - Si aun así el historial supera el presupuesto del tenant, se descartan
+      los turnos literales más antiguos del prompt.
+    """
+
+    def __init__(self, keep_turns: int, summary_batch: int, default_budget: int):
+        self.keep_turns = keep_turns
+        self.summary_batch = summary_batch
+        self.default_budget = default_budget
+
+        # Métricas
+        self.turns = 0
+        self.summaries = 0
+        self._tokens_before = 0
+        self._tokens_after = 0
+
+    async def token_budget(self, db: AsyncSession, tenant_id: int) -> int:
+        tenant = await tenant_registry.get_by_id(db, tenant_id)
+        budget = tenant.history_token_budget if tenant else None
+        return budget or self.default_budget
+
+    async def pending_turns(
+        self, db: AsyncSession, context: dict, session_id: int
+    ) -> List[Dict]:
+        """
+        Turnos recientes que aún no están en el resumen, en orden.
+        """
+        summarized_seq = context.get("summarized_seq", 0)
+        turns = await turn_store.recent(db, session_id)
+        return [entry for entry in turns if entry["seq"] > summarized_seq]
+
+    async def compact(
+        self,
+        db: AsyncSession,
+        context: dict,
+        turns: List[Dict],
+        tenant_id: int,
+        session_id: int,
+    ) -> bool:
+        """
+        Resume los turnos antiguos si ya hay suficientes. Modifica `context`
+        y devuelve True si hay que guardarlo.
+        """
+        if len(turns) < self.keep_turns + self.summary_batch:
+            return False
+
+        summarized_seq = context.get("summarized_seq", 0)
+        upto_seq = turns[-self.keep_turns]["seq"] - 1
+        old_turns = await turn_store.between(db, session_id, summarized_seq, upto_seq)
+        try:
+            summary = await self._summarise(
+                context.get("summary"), old_turns, tenant_id, session_id
+            )
+        except Exception as e:
+            logger.error(f"❌ Error resumiendo el historial: {e}", exc_info=True)
+            return False
+
+        context["summary"] = summary
+        context["summarized_seq"] = upto_seq
+        context["summarized_tokens"] = context.get(
+            "summarized_tokens", 0
+        ) + count_message_tokens(turns_to_messages(old_turns))
+        self.summaries += 1
+        logger.info(f"📝 {len(old_turns)} turnos resumidos en el historial.")
+        return True
+
+    async def _summarise(
+        self,
+        previous: Optional[str],
+        turns: List[Dict],
+        tenant_id: int,
+        session_id: int,
+    ) -> str:
+        transcript = "\n".join(
+            f"Cliente: {entry['user']}\nCamarero: {entry['bot']}" for entry in turns
+        )
+        if previous:
+            transcript = (
+                f"Resumen anterior:\n{previous}\n\nNuevos turnos:\n{transcript}"
+            )
+
+        response = await call_openai(
+            lambda client: client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=[
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                    {"role": "user", "content": transcript},
+                ],
+                temperature=0,
+            ),
+            model=CHAT_MODEL,
+            tenant_id=tenant_id,
+            session_id=session_id,
+        )
+        return response.choices[0].message.content.strip()
+
+    def history_messages(
+        self, context: dict, turns: List[Dict], budget: int
+    ) -> List[Dict[str, str]]:
+        """
+        Mensajes de historial (resumen y turnos recientes) dentro del presupuesto.
+        """
+        summarized_seq = context.get("summarized_seq", 0)
+        turns = [entry for entry in turns if entry["seq"] > summarized_seq]
+        turns = turns[-self.keep_turns :]
+        summary = context.get("summary")
+        summary_messages = (
+            [{"role": "system", "content": f"Resumen de la conversación:\n{summary}"}]
+            if summary
+            else []
+        )
+
+        used = count_message_tokens(summary_messages)
+        kept = []
+        for entry in reversed(turns):
+            cost = count_message_tokens(turns_to_messages([entry]))
+            if used + cost > budget:
+                break
+            kept.insert(0, entry)
+            used += cost
+
+        return summary_messages + turns_to_messages(kept)
+
+    def record(self, context: dict, turns: List[Dict], messages: List[Dict[str, str]]):
+        """
+        Registra los tokens del prompt enviado frente a los que costaría
+        enviar el historial completo literalmente (incluidos los turnos ya
+        resumidos).
+        """
+        summarized_seq = context.get("summarized_seq", 0)
+        pending = [entry for entry in turns if entry["seq"] > summarized_seq]
+        naive = [messages[0]] + turns_to_messages(pending) + [messages[-1]]
+        before = count_message_tokens(naive) + context.get("summarized_tokens", 0)
+        after = count_message_tokens(messages)
+
+        self.turns += 1
+        self._tokens_before += before
+        self._tokens_after += after
+        logger.info(f"🧮 Tokens de prompt: {before} sin recortar → {after} enviados")
+
+    def stats(self) -> dict:
+        return {
+            "turns": self.turns,
+            "summaries": self.summaries,
+            "prompt_tokens_before_avg": (
+                round(self._tokens_before / self.turns) if self.turns else 0
+            ),
+            "prompt_tokens_after_avg": (
+                round(self._tokens_after / self.turns) if self.turns else 0
+            ),
+        }
+
+
+# Instancia global del gestor de historial
+history_manager = HistoryManager(
+    keep_turns=settings.HISTORY_KEEP_TURNS,
+    summary_batch=settings.HISTORY_SUMMARY_BATCH,
+    default_budget=settings.HISTORY_TOKEN_BUDGET,
+)
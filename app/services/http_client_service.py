@@ -0,0 +1,61 @@
+import logging
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cliente HTTP compartido para la Graph API de WhatsApp
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Crea un cliente HTTP asíncrono con conexiones keep-alive y los límites
+    y timeouts de la configuración.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.HTTP_READ_TIMEOUT_SECONDS,
+            connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+async def init_http_client():
+    """
+    Crea el cliente compartido (se llama desde `lifespan`).
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+        logger.info("🌐 Cliente HTTP compartido iniciado.")
+
+
+async def close_http_client():
+    """
+    Cierra el cliente compartido y sus conexiones (se llama desde `lifespan`).
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("🛑 Cliente HTTP compartido cerrado.")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Devuelve el cliente compartido, creándolo si aún no existe
+    (p. ej. en scripts que no pasan por `lifespan`).
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client()
+    return _http_client
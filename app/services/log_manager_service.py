@@ -2,7 +2,7 @@ import logging
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.sessions import SessionLog
+from app.services.conversation_service import turn_store
 
 # 🔥 Configuración del Logger
 logger = logging.getLogger("log_manager_service")
@@ -22,22 +22,10 @@ async def save_message_log(
     db: AsyncSession,
 ):
     """
-    Guarda un mensaje en la tabla de logs de sesión.
+    Guarda el turno (mensaje y respuesta) en el historial de la sesión.
     """
     try:
-        if db.in_transaction():  # Verifica si hay una transacción activa
-            logger.warning("⚠️ Se ha detectado una transacción activa en la sesión.")
-
-        else:
-            async with db.begin():
-                new_log = SessionLog(
-                    session_id=session_id,
-                    user_message=user_message,
-                    bot_response=bot_response,
-                    tenant_id=tenant_id,
-                )
-                db.add(new_log)
-                await db.flush()
+        await turn_store.append(db, session_id, tenant_id, user_message, bot_response)
 
     except Exception as e:
         await db.rollback()
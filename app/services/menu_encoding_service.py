@@ -0,0 +1,156 @@
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class MenuEncoder:
+    """
+    Forma de escribir el menú dentro del prompt.
+
+    `header` es la frase que presenta el menú al modelo y `encode` convierte
+    la lista de categorías de `fetch_menu_as_json` en texto.
+    """
+
+    name: str
+    header: str
+    encode: Callable[[List[Dict]], str]
+
+
+def _format_price(price) -> str:
+    return f"{price:.2f}€"
+
+
+def encode_repr(menu: List[Dict]) -> str:
+    # Formato original: `repr` del diccionario, con todos los platos
+    return str(menu)
+
+
+def encode_json(menu: List[Dict]) -> str:
+    # JSON sin espacios ni escapes de acentos, sin platos ni extras agotados
+    return json.dumps(
+        [
+            {
+                "name": category["name"],
+                "items": [
+                    {
+                        "name": item["name"],
+                        "ingredients": item["ingredients"],
+                        "price": item["price"],
+                        "extras": [
+                            {"name": extra["name"], "price": extra["price"]}
+                            for extra in item["extras"]
+                            if extra["available"]
+                        ],
+                    }
+                    for item in category["items"]
+                    if item["available"]
+                ],
+            }
+            for category in menu
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def encode_lines(menu: List[Dict]) -> str:
+    """
+    Una línea por plato disponible, agrupados por categoría:
+
+        # Hamburguesas
+        - Clásica | 9.50€ | carne, lechuga | extras: Queso +1.00€; Bacon +1.50€
+    """
+    lines = []
+    for category in menu:
+        items = [item for item in category["items"] if item["available"]]
+        if not items:
+            continue
+
+        lines.append(f"# {category['name']}")
+        for item in items:
+            fields = [item["name"], _format_price(item["price"])]
+            if item["ingredients"]:
+                fields.append(item["ingredients"])
+
+            extras = [
+                f"{extra['name']} +{_format_price(extra['price'])}"
+                for extra in item["extras"]
+                if extra["available"]
+            ]
+            if extras:
+                fields.append("extras: " + "; ".join(extras))
+
+            lines.append("- " + " | ".join(fields))
+
+    return "\n".join(lines)
+
+
+MENU_ENCODERS: Dict[str, MenuEncoder] = {
+    encoder.name: encoder
+    for encoder in (
+        MenuEncoder(
+            "repr",
+            "Aquí tienes el menú en formato JSON:",
+            encode_repr,
+        ),
+        MenuEncoder(
+            "json",
+            "Aquí tienes el menú en formato JSON (solo platos y extras disponibles):",
+            encode_json,
+        ),
+        MenuEncoder(
+            "lines",
+            "Aquí tienes el menú. Cada línea es un plato disponible con el formato "
+            "'- nombre | precio | ingredientes | extras: extra +precio; ...'. "
+            "Lo que no aparece no está disponible:",
+            encode_lines,
+        ),
+    )
+}
+
+
+def get_menu_encoder(name: str) -> MenuEncoder:
+    if name not in MENU_ENCODERS:
+        raise ValueError(
+            f"Codificador de menú desconocido: {name} "
+            f"(disponibles: {', '.join(MENU_ENCODERS)})"
+        )
+    return MENU_ENCODERS[name]
+
+
+class MenuEncodingCache:
+    """
+    Caché LRU del menú ya codificado por (codificador, versión del menú).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+
+    def encode(self, menu: List[Dict], menu_version: str, encoder: MenuEncoder) -> str:
+        key = (encoder.name, menu_version)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        encoded = f"{encoder.header}\n{encoder.encode(menu)}"
+        self._entries[key] = encoded
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return encoded
+
+
+# Instancia global del caché de menús codificados
+menu_encoding_cache = MenuEncodingCache(max_size=settings.PROMPT_PREFIX_CACHE_SIZE)
+
+
+def encode_menu(menu: List[Dict], menu_version: str) -> str:
+    """
+    Devuelve el menú listo para el prompt con el codificador configurado.
+    """
+    encoder = get_menu_encoder(settings.MENU_ENCODER)
+    return menu_encoding_cache.encode(menu, menu_version, encoder)
@@ -0,0 +1,252 @@
+import math
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Parámetros estándar de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# El nombre del plato pesa más que sus ingredientes o extras
+NAME_WEIGHT = 2
+
+# Platos con menos de esta fracción de la mejor puntuación no se incluyen
+RELATIVE_SCORE_CUTOFF = 0.25
+
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "favor", "hay", "la",
+    "las", "lo", "los", "me", "mas", "o", "para", "por", "que", "quiero",
+    "se", "sin", "su", "te", "teneis", "tienes", "un", "una", "unos", "y",
+}  # fmt: skip
+
+
+def normalize_terms(text: str) -> List[str]:
+    """
+    Términos de búsqueda de un texto: minúsculas, sin acentos, sin palabras
+    vacías y con el plural español reducido al singular
+    ("Champiñones" → "champinon", "Patatas" → "patata").
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        if word in STOPWORDS or (word.isdigit() and len(word) < 3):
+            continue  # Los números cortos suelen ser mesas o cantidades
+        if len(word) > 4 and word.endswith("es") and word[-3] in "nrldzj":
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+@dataclass
+class _Document:
+    category: str
+    item: Dict
+    terms: Counter
+    length: int
+
+
+class MenuIndex:
+    """
+    Índice invertido BM25 sobre los platos disponibles de un menú
+    (nombre, categoría, ingredientes y extras).
+    """
+
+    def __init__(self, menu: List[Dict]):
+        self.categories: Dict[str, List[Dict]] = {}
+        self._category_terms: Dict[str, set] = {}
+        self._documents: List[_Document] = []
+        self._postings: Dict[str, List[int]] = {}
+
+        for category in menu:
+            items = [item for item in category["items"] if item["available"]]
+            if not items:
+                continue
+
+            self.categories[category["name"]] = items
+            self._category_terms[category["name"]] = set(
+                normalize_terms(category["name"])
+            )
+
+            for item in items:
+                terms = normalize_terms(item["name"]) * NAME_WEIGHT
+                terms += normalize_terms(category["name"])
+                terms += normalize_terms(item["ingredients"] or "")
+                for extra in item["extras"]:
+                    if extra["available"]:
+                        terms += normalize_terms(extra["name"])
+
+                counts = Counter(terms)
+                for term in counts:
+                    self._postings.setdefault(term, []).append(len(self._documents))
+                self._documents.append(
+                    _Document(category["name"], item, counts, len(terms))
+                )
+
+        self.size = len(self._documents)
+        self._avg_length = (
+            sum(doc.length for doc in self._documents) / self.size if self.size else 0
+        )
+
+    def _idf(self, term: str) -> float:
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def search(self, terms: List[str]) -> List[Tuple[float, _Document]]:
+        """
+        Platos ordenados por puntuación BM25 para los términos dados.
+        """
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            idf = self._idf(term)
+            for doc_id in self._postings.get(term, ()):
+                doc = self._documents[doc_id]
+                tf = doc.terms[term]
+                norm = 1 - BM25_B + BM25_B * doc.length / self._avg_length
+                score = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+        ranked = sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+        return [(score, self._documents[doc_id]) for doc_id, score in ranked]
+
+    def matching_categories(self, terms: List[str]) -> List[str]:
+        query = set(terms)
+        return [
+            name
+            for name, category_terms in self._category_terms.items()
+            if category_terms & query
+        ]
+
+    def retrieve(
+        self, terms: List[str], max_items: int, min_score: float
+    ) -> Optional[List[Dict]]:
+        """
+        Submenú (misma estructura que `fetch_menu_as_json`) con las categorías
+        nombradas y los platos más relevantes, o None si la confianza es baja.
+        """
+        ranked = self.search(terms)
+        named = self.matching_categories(terms)
+        if not named and (not ranked or ranked[0][0] < min_score):
+            return None
+
+        selected: Dict[str, List[Dict]] = OrderedDict()
+
+        def add(category: str, item: Dict):
+            items = selected.setdefault(category, [])
+            if not any(existing is item for existing in items):
+                items.append(item)
+
+        # Primero los platos que mejor encajan con el mensaje...
+        cutoff = ranked[0][0] * RELATIVE_SCORE_CUTOFF if ranked else 0
+        for score, doc in ranked[:max_items]:
+            if score < cutoff:
+                break
+            add(doc.category, doc.item)
+
+        # ...y después las categorías pedidas explícitamente ("¿qué pizzas hay?")
+        for name in named:
+            for item in self.categories[name]:
+                add(name, item)
+
+        # Respetar el límite aunque una categoría pedida sea muy grande
+        remaining = max_items
+        result = []
+        for name, items in selected.items():
+            if remaining <= 0:
+                break
+            result.append({"name": name, "items": items[:remaining]})
+            remaining -= len(items[:remaining])
+        return result
+
+
+class MenuIndexCache:
+    """
+    Índices por versión de menú (LRU): se construyen una vez por menú.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self.retrievals = 0
+        self.fallbacks = 0
+
+    def get(self, menu: List[Dict], menu_version: str) -> MenuIndex:
+        if menu_version in self._entries:
+            self._entries.move_to_end(menu_version)
+            return self._entries[menu_version]
+
+        index = MenuIndex(menu)
+        self._entries[menu_version] = index
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return index
+
+    def stats(self) -> dict:
+        return {
+            "indexes": len(self._entries),
+            "retrievals": self.retrievals,
+            "full_menu_fallbacks": self.fallbacks,
+        }
+
+
+# Instancia global del caché de índices de menú
+menu_index_cache = MenuIndexCache(max_size=settings.PROMPT_PREFIX_CACHE_SIZE)
+
+
+def menu_item_count(menu: List[Dict]) -> int:
+    return sum(len(category["items"]) for category in menu)
+
+
+def use_menu_retrieval(menu: List[Dict], menu_prompt_mode: str) -> bool:
+    """
+    Solo se recortan los menús grandes de los tenants en modo "retrieval";
+    los demás van enteros en el prefijo.
+    """
+    return (
+        menu_prompt_mode == "retrieval"
+        and menu_item_count(menu) > settings.MENU_RETRIEVAL_MIN_MENU_ITEMS
+    )
+
+
+def retrieval_query(context: dict, turns: List[Dict], user_message: str) -> str:
+    """
+    Texto de búsqueda: el mensaje actual más el último turno y el pedido en
+    curso, para que sigan en el prompt los platos de los que se está hablando.
+
+    El pedido en curso (`current_order`) es el último "Resumen del Pedido"
+    de la sesión, guardado con `order_cart`: solo cuentan sus nombres de
+    platos y extras.
+    """
+    parts = [user_message]
+    if turns:
+        parts += [turns[-1]["user"], turns[-1]["bot"]]
+    for line in context.get("current_order") or []:
+        parts += [line["nombre"], *line["extras"]]
+    return "\n".join(parts)
+
+
+def retrieve_menu(
+    menu: List[Dict], menu_version: str, query: str
+) -> Optional[List[Dict]]:
+    """
+    Platos relevantes para `query`, o None si no hay suficiente confianza y
+    hay que enviar el menú completo.
+    """
+    index = menu_index_cache.get(menu, menu_version)
+    selected = index.retrieve(
+        normalize_terms(query),
+        max_items=settings.MENU_RETRIEVAL_MAX_ITEMS,
+        min_score=settings.MENU_RETRIEVAL_MIN_SCORE,
+    )
+    if selected is None:
+        menu_index_cache.fallbacks += 1
+    else:
+        menu_index_cache.retrievals += 1
+    return selected
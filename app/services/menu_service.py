@@ -1,15 +1,144 @@
+import asyncio
+import copy
+import json
+from dataclasses import dataclass
+
+from sqlalchemy import Text, cast, func, insert, literal_column, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+
+from app.models.menu import Category, Extra, MenuItem
+from app.models.sessions import Session
+from app.models.tenants import Tenant
+from app.schemas.menu import CategorySchema, MenuPatchSchema
+from app.services.menu_snapshot_service import menu_snapshots, serialize_menu
+
+
+def _json_object(**fields):
+    # Claves como literales: con asyncpg, `json_build_object` no admite
+    # parámetros sin tipo
+    arguments = []
+    for key, value in fields.items():
+        arguments += [literal_column(f"'{key}'"), value]
+    return func.json_build_object(*arguments)
+
+
+def _json_array(element, order_by):
+    return func.coalesce(
+        func.json_agg(aggregate_order_by(element, order_by)),
+        literal_column("'[]'::json"),
+    )
+
+
+def _menu_document_query(tenant_id: int):
+    """
+    Consulta de PostgreSQL que devuelve el menú completo (categorías → platos
+    → extras) como un único documento JSON, ya filtrado por tenant.
+    """
+    extras = (
+        select(
+            _json_array(
+                _json_object(
+                    name=Extra.name, price=Extra.price, available=Extra.available
+                ),
+                Extra.id,
+            )
+        )
+        .where(Extra.menu_item_id == MenuItem.id, Extra.tenant_id == tenant_id)
+        .scalar_subquery()
+    )
+    items = (
+        select(
+            _json_array(
+                _json_object(
+                    name=MenuItem.name,
+                    ingredients=MenuItem.ingredients,
+                    price=MenuItem.price,
+                    available=MenuItem.available,
+                    extras=extras,
+                ),
+                MenuItem.id,
+            )
+        )
+        .where(MenuItem.category_id == Category.id, MenuItem.tenant_id == tenant_id)
+        .scalar_subquery()
+    )
+    return select(
+        cast(
+            _json_array(_json_object(name=Category.name, items=items), Category.id),
+            Text,
+        )
+    ).where(Category.tenant_id == tenant_id)
+
+
+async def _fetch_menu_rows(tenant_id: int, db: AsyncSession) -> List[Dict]:
+    """
+    Alternativa portable (SQLite): tres consultas de columnas, sin hidratar
+    objetos del ORM, montadas en diccionarios en Python.
+    """
+    categories = (
+        await db.execute(
+            select(Category.id, Category.name)
+            .where(Category.tenant_id == tenant_id)
+            .order_by(Category.id)
+        )
+    ).all()
+    items = (
+        await db.execute(
+            select(
+                MenuItem.id,
+                MenuItem.category_id,
+                MenuItem.name,
+                MenuItem.ingredients,
+                MenuItem.price,
+                MenuItem.available,
+            )
+            .where(MenuItem.tenant_id == tenant_id)
+            .order_by(MenuItem.id)
+        )
+    ).all()
+    extras = (
+        await db.execute(
+            select(Extra.menu_item_id, Extra.name, Extra.price, Extra.available)
+            .where(Extra.tenant_id == tenant_id)
+            .order_by(Extra.id)
+        )
+    ).all()
 
-from app.models.menu import Category, MenuItem
+    extras_by_item: Dict[int, List[Dict]] = {}
+    for menu_item_id, name, price, available in extras:
+        extras_by_item.setdefault(menu_item_id, []).append(
+            {"name": name, "price": price, "available": available}
+        )
+
+    items_by_category: Dict[int, List[Dict]] = {}
+    for item in items:
+        items_by_category.setdefault(item.category_id, []).append(
+            {
+                "name": item.name,
+                "ingredients": item.ingredients,
+                "price": item.price,
+                "available": item.available,
+                "extras": extras_by_item.get(item.id, []),
+            }
+        )
+
+    return [
+        {"name": name, "items": items_by_category.get(category_id, [])}
+        for category_id, name in categories
+    ]
 
 
 async def fetch_menu_as_json(tenant_id: int, db: AsyncSession) -> List[Dict]:
     """
     Consulta la base de datos y genera un menú en formato JSON.
 
+    En PostgreSQL el documento se construye en la base de datos con
+    `json_agg`/`json_build_object` en una sola consulta; en otros motores se
+    usa `_fetch_menu_rows`. Categorías, platos y extras van ordenados por id.
+
     Parámetros:
         - tenant_id (int): ID del tenant para filtrar el menú.
         - db (AsyncSession): Sesión asíncrona de SQLAlchemy.
@@ -17,50 +146,448 @@ async def fetch_menu_as_json(tenant_id: int, db: AsyncSession) -> List[Dict]:
     Retorna:
         - List[Dict]: Lista con la estructura del menú en JSON.
     """
-    # Consulta filtrando por tenant_id y cargando relaciones con selectinload
-    result = await db.execute(
-        select(Category)
-        .where(Category.tenant_id == tenant_id)  # Filtrar por tenant_id
-        .options(
-            selectinload(Category.items).selectinload(
-                MenuItem.extras
-            )  # Cargar relaciones sin joins
+    if db.get_bind().dialect.name != "postgresql":
+        return await _fetch_menu_rows(tenant_id, db)
+
+    result = await db.execute(_menu_document_query(tenant_id))
+    # Los únicos números del documento son precios (float8), pero
+    # `json_build_object` escribe 10.0 como 10: se leen como float para que el
+    # menú (y su hash en `menu_versions`) sea idéntico al de `_fetch_menu_rows`
+    return json.loads(result.scalar_one(), parse_int=float)
+
+
+@dataclass(frozen=True)
+class CachedMenu:
+    """
+    Menú de un tenant tal como lo devuelve `fetch_menu_as_json`, junto con
+    su JSON canónico (`serialize_menu`) y la versión con la que se cargó.
+    """
+
+    version: int
+    menu: List[Dict]
+    payload: bytes
+
+
+class MenuCache:
+    """
+    Caché por tenant de `fetch_menu_as_json`, validada con `tenants.menu_version`.
+
+    - Cada consulta lee solo la versión del tenant (por clave primaria); si
+      coincide con la guardada, no se vuelve a cargar el menú.
+    - Subir o modificar el menú incrementa la versión (`bump_menu_version`),
+      así que todos los procesos recargan el menú en su siguiente consulta.
+    - Si llegan varias peticiones a la vez para un tenant sin menú en caché,
+      solo la primera lo carga; las demás esperan su resultado.
+    """
+
+    def __init__(self):
+        self._entries: Dict[int, CachedMenu] = {}
+        self._loading: Dict[Tuple[int, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, db: AsyncSession, tenant_id: int) -> CachedMenu:
+        result = await db.execute(
+            select(Tenant.menu_version).where(Tenant.id == tenant_id)
         )
+        version = result.scalar_one_or_none() or 0
+
+        entry = self._entries.get(tenant_id)
+        if entry and entry.version == version:
+            self.hits += 1
+            return entry
+
+        key = (tenant_id, version)
+        if key in self._loading:
+            self.coalesced += 1
+            return await asyncio.shield(self._loading[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # Evita el aviso de excepción no recuperada si nadie más espera
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._loading[key] = future
+        try:
+            menu = await fetch_menu_as_json(tenant_id, db)
+            entry = CachedMenu(version, menu, serialize_menu(menu))
+            current = self._entries.get(tenant_id)
+            if current is None or current.version <= version:
+                self._entries[tenant_id] = entry
+            future.set_result(entry)
+            return entry
+
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+
+        finally:
+            del self._loading[key]
+
+    def put(self, tenant_id: int, entry: CachedMenu):
+        """
+        Guarda un menú ya construido (p. ej. tras un cambio parcial), salvo
+        que la caché tenga ya una versión posterior.
+        """
+        current = self._entries.get(tenant_id)
+        if current is None or current.version <= entry.version:
+            self._entries[tenant_id] = entry
+
+    def invalidate(self, tenant_id: int):
+        self._entries.pop(tenant_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "tenants": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+# Instancia global de la caché de menús
+menu_cache = MenuCache()
+
+
+async def bump_menu_version(db: AsyncSession, tenant_id: int) -> int:
+    """
+    Incrementa la versión del menú del tenant (sin commit) y devuelve la nueva.
+    """
+    result = await db.execute(
+        update(Tenant)
+        .where(Tenant.id == tenant_id)
+        .values(menu_version=Tenant.menu_version + 1)
+        .returning(Tenant.menu_version)
     )
+    return result.scalar_one()
+
+
+def _changed(row, fields: Dict) -> bool:
+    return any(getattr(row, name) != value for name, value in fields.items())
 
-    categories = result.scalars().all()
 
-    # Filtrar items y extras en Python para evitar filtrado innecesario en SQL
+async def upsert_menu(
+    db: AsyncSession, tenant_id: int, categories: List[CategorySchema]
+) -> Dict[str, int]:
+    """
+    Carga un menú completo sin duplicados con un número fijo de consultas.
+
+    Lee el menú actual del tenant en tres consultas, calcula las diferencias
+    en memoria y las aplica con INSERT y UPDATE masivos: crea las
+    categorías, platos y extras nuevos y actualiza precio, disponibilidad e
+    ingredientes de los que ya existían. No borra nada ni hace commit.
+
+    Retorna:
+        - Dict[str, int]: Cuántas filas se crearon y actualizaron.
+    """
+    # 1️⃣ Menú actual del tenant
+    category_ids = {
+        name: category_id
+        for category_id, name in (
+            await db.execute(
+                select(Category.id, Category.name).where(
+                    Category.tenant_id == tenant_id
+                )
+            )
+        ).all()
+    }
+    items = {
+        (row.category_id, row.name): row
+        for row in (
+            await db.execute(
+                select(
+                    MenuItem.id,
+                    MenuItem.category_id,
+                    MenuItem.name,
+                    MenuItem.ingredients,
+                    MenuItem.price,
+                    MenuItem.available,
+                ).where(MenuItem.tenant_id == tenant_id)
+            )
+        ).all()
+    }
+    extras = {
+        (row.menu_item_id, row.name): row
+        for row in (
+            await db.execute(
+                select(
+                    Extra.id,
+                    Extra.menu_item_id,
+                    Extra.name,
+                    Extra.price,
+                    Extra.available,
+                ).where(Extra.tenant_id == tenant_id)
+            )
+        ).all()
+    }
+
+    # 2️⃣ Categorías nuevas
+    new_categories = [
+        {"tenant_id": tenant_id, "name": name}
+        for name in dict.fromkeys(category.name for category in categories)
+        if name not in category_ids
+    ]
+    if new_categories:
+        result = await db.execute(
+            insert(Category).returning(Category.id, Category.name), new_categories
+        )
+        category_ids.update({name: category_id for category_id, name in result.all()})
+
+    # 3️⃣ Platos: nuevos y modificados (si se repite un plato, gana el último)
+    item_data = {}
     for category in categories:
-        category.items = [
-            item for item in category.items if item.tenant_id == tenant_id
-        ]
         for item in category.items:
-            item.extras = [
-                extra for extra in item.extras if extra.tenant_id == tenant_id
-            ]
+            item_data[(category_ids[category.name], item.name)] = item
 
-    # Construcción del JSON del menú
-    return [
-        {
-            "name": category.name,
-            "items": [
+    new_items, item_updates = [], []
+    for (category_id, name), item in item_data.items():
+        fields = {
+            "ingredients": item.ingredients,
+            "price": item.price,
+            "available": item.available,
+        }
+        existing = items.get((category_id, name))
+        if existing is None:
+            new_items.append(
                 {
-                    "name": item.name,
-                    "ingredients": item.ingredients,
-                    "price": item.price,
-                    "available": item.available,
-                    "extras": [
-                        {
-                            "name": extra.name,
-                            "price": extra.price,
-                            "available": extra.available,
-                        }
-                        for extra in item.extras  # Filtrado en Python
-                    ],
+                    "tenant_id": tenant_id,
+                    "category_id": category_id,
+                    "name": name,
+                    **fields,
                 }
-                for item in category.items  # Filtrado en Python
-            ],
+            )
+        elif _changed(existing, fields):
+            item_updates.append({"id": existing.id, **fields})
+
+    item_ids = {key: row.id for key, row in items.items()}
+    if new_items:
+        result = await db.execute(
+            insert(MenuItem).returning(
+                MenuItem.id, MenuItem.category_id, MenuItem.name
+            ),
+            new_items,
+        )
+        item_ids.update(
+            {
+                (category_id, name): item_id
+                for item_id, category_id, name in result.all()
+            }
+        )
+    if item_updates:
+        await db.execute(update(MenuItem), item_updates)
+
+    # 4️⃣ Extras: nuevos y modificados
+    extra_data = {}
+    for (category_id, item_name), item in item_data.items():
+        for extra in item.extras:
+            extra_data[(item_ids[(category_id, item_name)], extra.name)] = extra
+
+    new_extras, extra_updates = [], []
+    for (menu_item_id, name), extra in extra_data.items():
+        fields = {"price": extra.price, "available": extra.available}
+        existing = extras.get((menu_item_id, name))
+        if existing is None:
+            new_extras.append(
+                {
+                    "tenant_id": tenant_id,
+                    "menu_item_id": menu_item_id,
+                    "name": name,
+                    **fields,
+                }
+            )
+        elif _changed(existing, fields):
+            extra_updates.append({"id": existing.id, **fields})
+
+    if new_extras:
+        await db.execute(insert(Extra), new_extras)
+    if extra_updates:
+        await db.execute(update(Extra), extra_updates)
+
+    return {
+        "categories_created": len(new_categories),
+        "items_created": len(new_items),
+        "items_updated": len(item_updates),
+        "extras_created": len(new_extras),
+        "extras_updated": len(extra_updates),
+    }
+
+
+def _patch_fields(patch) -> Dict:
+    return {
+        name: value
+        for name, value in (("price", patch.price), ("available", patch.available))
+        if value is not None
+    }
+
+
+def _apply_patch(
+    menu: List[Dict], item_changes: Dict[Tuple, Dict], extra_changes: Dict[Tuple, Dict]
+) -> Optional[List[Dict]]:
+    """
+    Copia del menú con los cambios aplicados, o None si algún plato o extra
+    cambiado no está en el menú (el menú en caché no está al día).
+    """
+    menu = copy.deepcopy(menu)
+    items = {
+        (category["name"], item["name"]): item
+        for category in menu
+        for item in category["items"]
+    }
+    for key, fields in item_changes.items():
+        if key not in items:
+            return None
+        items[key].update(fields)
+
+    for (category_name, item_name, extra_name), fields in extra_changes.items():
+        item = items.get((category_name, item_name))
+        extras = [
+            extra
+            for extra in (item or {}).get("extras", [])
+            if extra["name"] == extra_name
+        ]
+        if not extras:
+            return None
+        for extra in extras:
+            extra.update(fields)
+    return menu
+
+
+async def patch_menu(db: AsyncSession, tenant_id: int, patch: MenuPatchSchema) -> Dict:
+    """
+    Cambia el precio o la disponibilidad de platos y extras concretos, por id
+    o por nombre, sin volver a cargar el menú completo.
+
+    - Un UPDATE ... RETURNING por cambio; solo se tocan esas filas. Si un
+      nombre coincide con varios platos (o extras), se cambian todos.
+    - Si algo cambió, incrementa `tenants.menu_version`, aplica los cambios
+      sobre el menú en caché (en vez de `fetch_menu_as_json`), guarda la
+      nueva versión en `menu_versions` y la asigna a las sesiones activas
+      del tenant, que la usan desde su siguiente mensaje.
+
+    Hace commit. Retorna cuántas filas cambiaron, los cambios que no
+    encontraron ninguna fila y la nueva versión del menú.
+    """
+    # Menú vigente antes del cambio, base del menú nuevo
+    current = await menu_cache.get(db, tenant_id)
+
+    # 1️⃣ Platos
+    updated_items, not_found = [], []
+    for item in patch.items:
+        conditions = [MenuItem.tenant_id == tenant_id]
+        if item.id is not None:
+            conditions.append(MenuItem.id == item.id)
+        if item.name:
+            conditions.append(MenuItem.name == item.name)
+        if item.category:
+            conditions.append(
+                MenuItem.category_id.in_(
+                    select(Category.id).where(
+                        Category.tenant_id == tenant_id,
+                        Category.name == item.category,
+                    )
+                )
+            )
+        result = await db.execute(
+            update(MenuItem)
+            .where(*conditions)
+            .values(**_patch_fields(item))
+            .returning(MenuItem.id, MenuItem.name, MenuItem.price, MenuItem.available)
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        updated_items += rows
+        if not rows:
+            not_found.append({"item": item.model_dump(exclude_none=True)})
+
+    # 2️⃣ Extras
+    updated_extras = []
+    for extra in patch.extras:
+        conditions = [Extra.tenant_id == tenant_id]
+        if extra.id is not None:
+            conditions.append(Extra.id == extra.id)
+        if extra.name:
+            conditions.append(Extra.name == extra.name)
+        if extra.item:
+            conditions.append(
+                Extra.menu_item_id.in_(
+                    select(MenuItem.id).where(
+                        MenuItem.tenant_id == tenant_id, MenuItem.name == extra.item
+                    )
+                )
+            )
+        result = await db.execute(
+            update(Extra)
+            .where(*conditions)
+            .values(**_patch_fields(extra))
+            .returning(Extra.menu_item_id, Extra.name, Extra.price, Extra.available)
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        updated_extras += rows
+        if not rows:
+            not_found.append({"extra": extra.model_dump(exclude_none=True)})
+
+    changes = {
+        "items_updated": len(updated_items),
+        "extras_updated": len(updated_extras),
+        "not_found": not_found,
+    }
+    if not updated_items and not updated_extras:
+        await db.rollback()
+        return changes
+
+    # 3️⃣ Dónde está cada fila cambiada en el documento del menú
+    item_ids = {row.id for row in updated_items} | {
+        row.menu_item_id for row in updated_extras
+    }
+    paths = {
+        item_id: (category_name, item_name)
+        for item_id, item_name, category_name in (
+            await db.execute(
+                select(MenuItem.id, MenuItem.name, Category.name)
+                .join(Category, MenuItem.category_id == Category.id)
+                .where(MenuItem.id.in_(item_ids))
+            )
+        ).all()
+    }
+    item_changes = {
+        paths[row.id]: {"price": row.price, "available": row.available}
+        for row in updated_items
+        if row.id in paths
+    }
+    extra_changes = {
+        (*paths[row.menu_item_id], row.name): {
+            "price": row.price,
+            "available": row.available,
         }
-        for category in categories
-    ]
+        for row in updated_extras
+        if row.menu_item_id in paths
+    }
+
+    version = await bump_menu_version(db, tenant_id)
+    await db.commit()
+    changes["menu_version"] = version
+
+    # 4️⃣ Menú nuevo a partir del que había en caché; si entretanto otra
+    # petición cambió el menú (la versión saltó más de uno), se recarga
+    menu = None
+    if version == current.version + 1:
+        menu = _apply_patch(current.menu, item_changes, extra_changes)
+    if menu is None:
+        menu_cache.invalidate(tenant_id)
+        entry = await menu_cache.get(db, tenant_id)
+    else:
+        entry = CachedMenu(version, menu, serialize_menu(menu))
+        menu_cache.put(tenant_id, entry)
+
+    # 5️⃣ Las sesiones activas pasan a la nueva versión del menú
+    snapshot = await menu_snapshots.store(db, tenant_id, entry.menu, entry.payload)
+    result = await db.execute(
+        update(Session)
+        .where(Session.tenant_id == tenant_id, Session.active)
+        .values(menu_version_id=snapshot.id)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    changes["sessions_updated"] = result.rowcount
+    return changes
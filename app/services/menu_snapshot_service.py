@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.menu import MenuVersion
+from app.services.database_service import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_menu(menu) -> bytes:
+    """
+    JSON canónico del menú (claves ordenadas), el que se guarda y se hashea.
+    """
+    return json.dumps(menu, sort_keys=True, ensure_ascii=False).encode()
+
+
+def menu_fingerprint(menu, payload: Optional[bytes] = None) -> str:
+    """
+    Hash estable del contenido del menú, usado como versión del menú.
+    """
+    return hashlib.sha256(payload or serialize_menu(menu)).hexdigest()
+
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    """
+    Menú decodificado de una fila de `menu_versions`. Lo comparten todas las
+    sesiones que lo usan, así que no se debe modificar.
+    """
+
+    id: Optional[int]
+    tenant_id: Optional[int]
+    version: str  # Hash del contenido: clave de los cachés de prompt y menú
+    menu: List[Dict]
+
+
+EMPTY_MENU = MenuSnapshot(
+    id=None, tenant_id=None, version=menu_fingerprint([]), menu=[]
+)
+
+
+class MenuSnapshotStore:
+    """
+    Menús guardados una sola vez por contenido en `menu_versions`.
+
+    - `store` devuelve la versión de un menú, creándola si es nueva (un único
+      INSERT ... ON CONFLICT DO NOTHING por menú distinto).
+    - `get` devuelve el menú de una versión ya decodificado. Se guarda una
+      copia por versión (LRU de `max_size`), compartida por todas las
+      sesiones, en vez de un `json.loads` del menú en cada turno.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._snapshots: OrderedDict = OrderedDict()  # id -> MenuSnapshot
+        self._ids: Dict[tuple, int] = {}  # (tenant_id, hash) -> id
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, snapshot: MenuSnapshot) -> MenuSnapshot:
+        self._snapshots[snapshot.id] = snapshot
+        self._snapshots.move_to_end(snapshot.id)
+        self._ids[(snapshot.tenant_id, snapshot.version)] = snapshot.id
+        while len(self._snapshots) > self.max_size:
+            _, evicted = self._snapshots.popitem(last=False)
+            self._ids.pop((evicted.tenant_id, evicted.version), None)
+        return snapshot
+
+    async def store(
+        self,
+        db: AsyncSession,
+        tenant_id: int,
+        menu: List[Dict],
+        payload: Optional[bytes] = None,
+    ) -> MenuSnapshot:
+        """
+        Versión del menú (existente o nueva). Las versiones nuevas se
+        confirman enseguida: son inmutables y no dependen de la sesión que
+        se esté creando. `payload` es el menú ya serializado con
+        `serialize_menu`, si se tiene.
+        """
+        payload = payload or serialize_menu(menu)
+        content_hash = menu_fingerprint(menu, payload)
+        version_id = self._ids.get((tenant_id, content_hash))
+        if version_id is not None:
+            self._snapshots.move_to_end(version_id)
+            return self._snapshots[version_id]
+
+        await db.execute(
+            dialect_insert(db, MenuVersion)
+            .values(
+                tenant_id=tenant_id,
+                content_hash=content_hash,
+                menu=payload.decode(),
+            )
+            .on_conflict_do_nothing(index_elements=["tenant_id", "content_hash"])
+        )
+        result = await db.execute(
+            select(MenuVersion.id).where(
+                MenuVersion.tenant_id == tenant_id,
+                MenuVersion.content_hash == content_hash,
+            )
+        )
+        version_id = result.scalar_one()
+        await db.commit()
+        logger.debug(f"🍽️ Versión de menú {content_hash[:12]} del tenant {tenant_id}")
+        return self._remember(MenuSnapshot(version_id, tenant_id, content_hash, menu))
+
+    async def get(self, db: AsyncSession, version_id: Optional[int]) -> MenuSnapshot:
+        """
+        Menú de una versión, o un menú vacío si la sesión no tiene ninguna.
+        """
+        if version_id is None:
+            return EMPTY_MENU
+
+        if version_id in self._snapshots:
+            self._snapshots.move_to_end(version_id)
+            self.hits += 1
+            return self._snapshots[version_id]
+
+        self.misses += 1
+        row = await db.get(MenuVersion, version_id)
+        if row is None:
+            logger.warning(f"⚠️ Versión de menú {version_id} no encontrada")
+            return EMPTY_MENU
+        return self._remember(
+            MenuSnapshot(row.id, row.tenant_id, row.content_hash, json.loads(row.menu))
+        )
+
+    def stats(self) -> dict:
+        return {
+            "snapshots": len(self._snapshots),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Instancia global de las versiones de menú
+menu_snapshots = MenuSnapshotStore(max_size=settings.MENU_SNAPSHOT_CACHE_SIZE)
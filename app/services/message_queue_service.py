@@ -0,0 +1,282 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.dependencies import async_session
+from app.models.whatsapp import (
+    QUEUE_STATUS_DONE,
+    QUEUE_STATUS_FAILED,
+    QUEUE_STATUS_PENDING,
+    QUEUE_STATUS_PROCESSING,
+    InboundMessage,
+)
+from app.services.conversation_scheduler_service import (
+    ConversationScheduler,
+    conversation_scheduler,
+)
+from app.services.tenant_service import get_message_coalesce_ms
+from app.services.whatsapp_service import MessageJob
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_message(
+    db: AsyncSession, message_id: str, from_number: str, message_body, tenant_id: int
+):
+    """
+    Añade un mensaje entrante a la cola duradera.
+    No hace commit: el llamador confirma todos los mensajes del webhook a la vez.
+    """
+    db.add(
+        InboundMessage(
+            message_id=message_id,
+            tenant_id=tenant_id,
+            from_number=from_number,
+            payload=json.dumps(message_body),
+            status=QUEUE_STATUS_PENDING,
+        )
+    )
+
+
+class MessageQueueWorkerPool:
+    """
+    Drena la tabla `inbound_messages` a través del planificador de
+    conversaciones.
+
+    Un despachador reclama los mensajes pendientes en orden de llegada con un
+    UPDATE condicional (solo se llevan las filas que siguen en "pendiente") y
+    los entrega al `ConversationScheduler`, que limita la concurrencia a
+    `size` conversaciones, respeta el orden por cliente y abre una sesión de
+    base de datos por mensaje.
+
+    Un mensaje que falla vuelve a "pendiente" con `next_attempt_at`: espera
+    `retry_base_seconds`, el doble en cada intento (hasta `retry_max_seconds`),
+    para que una caída de OpenAI o de la API de WhatsApp no agote sus
+    `max_attempts` en unos segundos.
+    """
+
+    def __init__(
+        self,
+        scheduler: ConversationScheduler,
+        size: int,
+        poll_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+    ):
+        self.scheduler = scheduler
+        self.size = size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._wakeup = asyncio.Event()
+        self._in_flight = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """
+        Reencola los mensajes que quedaron a medias y arranca el despachador.
+        """
+        replayed = await self.replay_unfinished()
+        if replayed:
+            logger.info(f"🔁 {replayed} mensajes reencolados tras el reinicio.")
+
+        self._task = asyncio.create_task(
+            self._dispatcher(), name="whatsapp-queue-dispatcher"
+        )
+        logger.info(f"🚀 Cola de WhatsApp iniciada con {self.size} workers.")
+
+    async def stop(self):
+        """
+        Detiene el despachador. Los mensajes en curso vuelven a la cola al reiniciar.
+        """
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logger.info("🛑 Cola de WhatsApp detenida.")
+
+    def notify(self):
+        """
+        Despierta al despachador tras encolar mensajes nuevos.
+        """
+        self._wakeup.set()
+
+    async def replay_unfinished(self) -> int:
+        """
+        Devuelve a "pendiente" los mensajes que estaban "procesando"
+        cuando se detuvo el proceso.
+        """
+        async with async_session() as db:
+            result = await db.execute(
+                update(InboundMessage)
+                .where(InboundMessage.status == QUEUE_STATUS_PROCESSING)
+                .values(status=QUEUE_STATUS_PENDING)
+            )
+            await db.commit()
+            return result.rowcount or 0
+
+    async def _claim_batch(self, limit: int) -> list:
+        """
+        Reclama hasta `limit` mensajes pendientes, ordenados por llegada,
+        salvo los que esperan para reintentar.
+        """
+        async with async_session() as db:
+            result = await db.execute(
+                select(InboundMessage.id)
+                .where(
+                    InboundMessage.status == QUEUE_STATUS_PENDING,
+                    or_(
+                        InboundMessage.next_attempt_at.is_(None),
+                        InboundMessage.next_attempt_at <= datetime.now(timezone.utc),
+                    ),
+                )
+                .order_by(InboundMessage.id)
+                .limit(limit)
+            )
+            queue_ids = result.scalars().all()
+            if not queue_ids:
+                return []
+
+            claimed = await db.execute(
+                update(InboundMessage)
+                .where(
+                    InboundMessage.id.in_(queue_ids),
+                    InboundMessage.status == QUEUE_STATUS_PENDING,
+                )
+                .values(
+                    status=QUEUE_STATUS_PROCESSING,
+                    attempts=InboundMessage.attempts + 1,
+                )
+                .returning(
+                    InboundMessage.id,
+                    InboundMessage.message_id,
+                    InboundMessage.tenant_id,
+                    InboundMessage.from_number,
+                    InboundMessage.payload,
+                    InboundMessage.attempts,
+                )
+            )
+            rows = sorted(claimed.all(), key=lambda row: row.id)
+            await db.commit()
+            return rows
+
+    async def _finish(
+        self,
+        queue_id: int,
+        status: str,
+        error: str = None,
+        next_attempt_at: datetime = None,
+    ):
+        async with async_session() as db:
+            await db.execute(
+                update(InboundMessage)
+                .where(InboundMessage.id == queue_id)
+                .values(
+                    status=status, last_error=error, next_attempt_at=next_attempt_at
+                )
+            )
+            await db.commit()
+
+    def _retry_at(self, attempts: int) -> datetime:
+        delay = min(
+            self.retry_base_seconds * 2 ** (attempts - 1), self.retry_max_seconds
+        )
+        return datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+    async def _complete(self, items: list, error: Exception = None):
+        """
+        Cierra los mensajes de la cola que procesó un trabajo (uno o varios
+        si se agruparon en un mismo turno).
+        """
+        try:
+            for item in items:
+                if error is None:
+                    await self._finish(item.id, QUEUE_STATUS_DONE)
+                    continue
+
+                logger.error(
+                    f"❌ Error procesando el mensaje en cola {item.message_id}: "
+                    f"{error}"
+                )
+                if item.attempts < self.max_attempts:
+                    await self._finish(
+                        item.id,
+                        QUEUE_STATUS_PENDING,
+                        str(error),
+                        next_attempt_at=self._retry_at(item.attempts),
+                    )
+                else:
+                    await self._finish(item.id, QUEUE_STATUS_FAILED, str(error))
+
+        finally:
+            self._in_flight -= len(items)
+            self.notify()
+
+    async def _dispatcher(self):
+        # Se admite algo más que `size` mensajes reclamados para que el
+        # planificador siempre tenga trabajo listo sin vaciar la cola entera.
+        max_in_flight = self.size * 2
+
+        while True:
+            try:
+                self._wakeup.clear()
+                free = max_in_flight - self._in_flight
+                rows = await self._claim_batch(free) if free > 0 else []
+
+                async with async_session() as db:
+                    for row in rows:
+                        self._in_flight += 1
+                        job = MessageJob(
+                            row.from_number,
+                            [json.loads(row.payload)],
+                            row.tenant_id,
+                            coalesce_ms=await get_message_coalesce_ms(
+                                db, row.tenant_id
+                            ),
+                            tags=[row],
+                            on_complete=self._complete,
+                            raise_errors=True,
+                        )
+                        future = self.scheduler.submit(
+                            row.tenant_id, row.from_number, job
+                        )
+                        # Nadie espera el futuro: el resultado lo gestiona `_complete`
+                        future.add_done_callback(
+                            lambda done: done.cancelled() or done.exception()
+                        )
+
+                if len(rows) < free or free <= 0:
+                    try:
+                        await asyncio.wait_for(
+                            self._wakeup.wait(), timeout=self.poll_seconds
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                logger.error(
+                    f"❌ Error en el despachador de la cola: {e}", exc_info=True
+                )
+                await asyncio.sleep(self.poll_seconds)
+
+
+# Instancia global del pool de workers
+message_queue = MessageQueueWorkerPool(
+    scheduler=conversation_scheduler,
+    size=settings.WHATSAPP_WORKERS,
+    poll_seconds=settings.WHATSAPP_QUEUE_POLL_SECONDS,
+    max_attempts=settings.WHATSAPP_QUEUE_MAX_ATTEMPTS,
+    retry_base_seconds=settings.WHATSAPP_QUEUE_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.WHATSAPP_QUEUE_RETRY_MAX_SECONDS,
+)
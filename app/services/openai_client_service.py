@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.services.usage_service import usage_tracker
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Modelos usados por la aplicación
+CHAT_MODEL = "gpt-4o-mini"
+TRANSCRIPTION_MODEL = "whisper-1"
+
+# Tras reducir el límite, los 429 de peticiones ya en vuelo no lo reducen otra vez
+DECREASE_COOLDOWN_SECONDS = 1.0
+
+# Cliente asíncrono compartido de OpenAI
+_openai_client: Optional[AsyncOpenAI] = None
+
+
+def create_openai_client() -> AsyncOpenAI:
+    """
+    Crea el cliente asíncrono de OpenAI con su propio pool de conexiones y
+    timeouts explícitos. Los reintentos del SDK se desactivan: los gestiona
+    `call_openai` para que los 429 lleguen al limitador.
+    """
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(
+                settings.OPENAI_READ_TIMEOUT_SECONDS,
+                connect=settings.OPENAI_CONNECT_TIMEOUT_SECONDS,
+            ),
+        ),
+    )
+
+
+async def init_openai_client():
+    """
+    Crea el cliente compartido (se llama desde `lifespan`).
+    """
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = create_openai_client()
+        logger.info("🤖 Cliente de OpenAI iniciado.")
+
+
+async def close_openai_client():
+    """
+    Cierra el cliente compartido y sus conexiones (se llama desde `lifespan`).
+    """
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+        logger.info("🛑 Cliente de OpenAI cerrado.")
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Devuelve el cliente compartido, creándolo si aún no existe.
+    """
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = create_openai_client()
+    return _openai_client
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Límite global de llamadas simultáneas a OpenAI con ajuste AIMD.
+
+    - Cada llamada correcta sube el límite en 1/límite (≈ +1 por cada
+      "ventana" completa de llamadas correctas).
+    - Un 429 lo reduce a la mitad, como mucho una vez por
+      `DECREASE_COOLDOWN_SECONDS`.
+
+    Las llamadas que no caben esperan en orden de llegada.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+        # Métricas
+        self.requests = 0
+        self.throttled = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _has_capacity(self) -> bool:
+        return self._in_flight < int(self.limit)
+
+    def _wake(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self):
+        start = time.monotonic()
+        if not self._waiters and self._has_capacity():
+            self._in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Ya se le había asignado un hueco: devolverlo
+                    self.release()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+
+        waited = time.monotonic() - start
+        self.requests += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    def release(self):
+        self._in_flight -= 1
+        self._wake()
+
+    def on_success(self):
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_overload(self):
+        self.throttled += 1
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN_SECONDS:
+            return
+
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit / 2)
+        logger.warning(f"🐢 OpenAI limitando (429): límite reducido a {self.limit:.1f}")
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "queue_wait_avg_ms": (
+                round(self._wait_total / self.requests * 1000, 1)
+                if self.requests
+                else 0
+            ),
+            "queue_wait_max_ms": round(self._wait_max * 1000, 1),
+        }
+
+
+# Instancia global del limitador de llamadas a OpenAI
+openai_limiter = AdaptiveConcurrencyLimiter(
+    initial=settings.OPENAI_CONCURRENCY_INITIAL,
+    min_limit=settings.OPENAI_CONCURRENCY_MIN,
+    max_limit=settings.OPENAI_CONCURRENCY_MAX,
+)
+
+
+def _backoff(attempt: int) -> float:
+    # Backoff exponencial con "full jitter"
+    return random.uniform(
+        0,
+        min(
+            settings.OPENAI_BACKOFF_MAX_SECONDS,
+            settings.OPENAI_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1),
+        ),
+    )
+
+
+async def call_openai(
+    request: Callable[[AsyncOpenAI], Awaitable[T]],
+    model: str,
+    tenant_id: Optional[int] = None,
+    session_id: Optional[int] = None,
+) -> T:
+    """
+    Ejecuta `request(cliente)` dentro del límite de concurrencia,
+    reintentando los 429 y los 5xx con backoff. Si se indica el tenant, los
+    tokens y la latencia de la respuesta se anotan en `usage_tracker`.
+    """
+    max_attempts = settings.OPENAI_MAX_ATTEMPTS
+    for attempt in range(1, max_attempts + 1):
+        await openai_limiter.acquire()
+        try:
+            start = time.perf_counter()
+            result = await request(get_openai_client())
+            latency = time.perf_counter() - start
+
+        except openai.RateLimitError:
+            openai_limiter.on_overload()
+            if attempt == max_attempts:
+                raise
+
+        except openai.InternalServerError:
+            if attempt == max_attempts:
+                raise
+
+        else:
+            openai_limiter.on_success()
+            if tenant_id is not None:
+                usage_tracker.record(tenant_id, session_id, model, result, latency)
+            return result
+
+        finally:
+            openai_limiter.release()
+
+        delay = _backoff(attempt)
+        logger.warning(
+            f"🔁 Reintento {attempt}/{max_attempts} a OpenAI en {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
@@ -1,13 +1,15 @@
-import openai
-
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import settings
 from app.services.context_manager_service import get_context, update_context
-from app.services.prompt_manager_service import prepare_prompt
-
-# Configurar la API de OpenAI
-openai.api_key = settings.OPENAI_API_KEY
+from app.services.history_manager_service import history_manager
+from app.services.menu_snapshot_service import menu_snapshots
+from app.services.openai_client_service import CHAT_MODEL, call_openai
+from app.services.prompt_manager_service import (
+    build_messages,
+    prepare_menu_message,
+    prepare_prompt,
+)
+from app.services.tenant_service import get_menu_prompt_mode
 
 
 async def generate_openai_response(
@@ -20,27 +22,48 @@ async def generate_openai_response(
     # Obtener el contexto actual de la sesión
     context = await get_context(session_id, tenant_id, db)
 
-    # Construir el prompt con menú y historial de la conversación
-    prompt = await prepare_prompt(db, context, tenant_id)
-
-    # Enviar el prompt a OpenAI
-    response = openai.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": user_message},
-        ],
-        temperature=0.3,
-    )
+    # Turnos recientes sin resumir; se resumen los antiguos cuando se acumulan
+    turns = await history_manager.pending_turns(db, context, session_id)
+    compacted = await history_manager.compact(db, context, turns, tenant_id, session_id)
 
-    bot_response = response.choices[0].message.content
+    # Menú vigente de la sesión (copia decodificada compartida)
+    snapshot = await menu_snapshots.get(db, context.get("menu_version_id"))
 
-    # Actualizar el contexto de la sesión
-    context.setdefault("conversation", []).append(
-        {"user": user_message, "bot": bot_response}
+    # Prompt fijo (instrucciones y menú) seguido del historial acotado por tokens
+    prompt = await prepare_prompt(db, snapshot, tenant_id)
+    budget = await history_manager.token_budget(db, tenant_id)
+    history = history_manager.history_messages(context, turns, budget)
+    menu_prompt_mode = await get_menu_prompt_mode(db, tenant_id)
+    menu_message = prepare_menu_message(
+        snapshot, menu_prompt_mode, context, turns, user_message
     )
-    await update_context(
-        session_id, {"conversation": context["conversation"]}, tenant_id, db
+    messages = build_messages(prompt, history, user_message, menu_message)
+    history_manager.record(context, turns, messages)
+
+    # Enviar el prompt a OpenAI
+    response = await call_openai(
+        lambda client: client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            temperature=0.3,
+        ),
+        model=CHAT_MODEL,
+        tenant_id=tenant_id,
+        session_id=session_id,
     )
 
-    return bot_response
+    # El turno se guarda en `conversation_turns` con `save_message_log`;
+    # en el contexto solo cambia el resumen
+    if compacted:
+        await update_context(
+            session_id,
+            {
+                "summary": context["summary"],
+                "summarized_seq": context["summarized_seq"],
+                "summarized_tokens": context["summarized_tokens"],
+            },
+            tenant_id,
+            db,
+        )
+
+    return response.choices[0].message.content
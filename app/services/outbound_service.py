@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.dependencies import async_session
+from app.services.whatsapp_service import send_message
+
+logger = logging.getLogger(__name__)
+
+RecipientKey = Tuple[int, str]
+
+
+class TokenBucket:
+    """
+    Limitador de ritmo: `rate` envíos por segundo con ráfagas de hasta `burst`.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class OutboundDispatcher:
+    """
+    Cola de salida de mensajes de WhatsApp.
+
+    - Un runner por destinatario (tenant_id, teléfono): los mensajes a un
+      mismo cliente salen en el orden en que se encolaron, también cuando hay
+      reintentos (p. ej. la confirmación siempre antes que el enlace de pago).
+    - Cada runner vacía de una pasada todo lo pendiente para su destinatario.
+    - Un token bucket por tenant respeta el límite de envío de su número.
+    - Las respuestas 429 y 5xx se reintentan con backoff exponencial y jitter.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        burst: int,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+    ):
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queues: Dict[RecipientKey, Deque] = {}
+        self._runners: Dict[RecipientKey, asyncio.Task] = {}
+        self._buckets: Dict[int, TokenBucket] = {}
+
+        # Métricas
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def enqueue(self, tenant_id: int, to: str, body: str) -> asyncio.Future:
+        """
+        Encola un mensaje y devuelve un futuro que se resuelve al enviarlo.
+        No hace falta esperarlo: el orden por destinatario está garantizado.
+        """
+        key = (tenant_id, to.lstrip("+"))
+        future = asyncio.get_running_loop().create_future()
+        # Evita el aviso de "exception was never retrieved" si nadie lo espera
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        self._queues.setdefault(key, deque()).append((to, body, future))
+        if key not in self._runners:
+            self._runners[key] = asyncio.create_task(self._drain(key))
+
+        return future
+
+    def _bucket(self, tenant_id: int) -> TokenBucket:
+        if tenant_id not in self._buckets:
+            self._buckets[tenant_id] = TokenBucket(self.rate_per_second, self.burst)
+        return self._buckets[tenant_id]
+
+    def _backoff(self, attempt: int) -> float:
+        # Backoff exponencial con "full jitter"
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        )
+
+    @staticmethod
+    def _retryable(status_code: int) -> bool:
+        return status_code == 429 or status_code >= 500
+
+    async def _deliver(self, tenant_id: int, to: str, body: str):
+        for attempt in range(1, self.max_attempts + 1):
+            await self._bucket(tenant_id).acquire()
+
+            start = time.perf_counter()
+            try:
+                async with async_session() as db:
+                    await send_message(to, body, tenant_id, db)
+
+            except HTTPException as e:
+                if attempt < self.max_attempts and self._retryable(e.status_code):
+                    delay = self._backoff(attempt)
+                    self.retries += 1
+                    logger.warning(
+                        f"🔁 Reintento {attempt}/{self.max_attempts} a {to} "
+                        f"en {delay:.2f}s (HTTP {e.status_code})"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                raise
+
+            latency = time.perf_counter() - start
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+            self.sent += 1
+            return
+
+    async def _drain(self, key: RecipientKey):
+        queue = self._queues[key]
+        tenant_id = key[0]
+        try:
+            while queue:
+                to, body, future = queue.popleft()
+                try:
+                    await self._deliver(tenant_id, to, body)
+                    if not future.done():
+                        future.set_result(None)
+
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"❌ Mensaje a {to} descartado: {e}")
+                    if not future.done():
+                        future.set_exception(e)
+
+        finally:
+            for _, _, future in queue:
+                future.cancel()
+            self._queues.pop(key, None)
+            self._runners.pop(key, None)
+
+    async def close(self, timeout: float):
+        """
+        Espera a que se vacíe la cola (como mucho `timeout` segundos) y
+        cancela lo que quede.
+        """
+        runners = list(self._runners.values())
+        if not runners:
+            return
+
+        _, pending = await asyncio.wait(runners, timeout=timeout)
+        for runner in pending:
+            runner.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        if pending:
+            logger.warning(f"⚠️ {len(pending)} destinatarios con mensajes sin enviar.")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": sum(len(queue) for queue in self._queues.values()),
+            "active_recipients": len(self._runners),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "send_latency_avg_ms": (
+                round(self._latency_total / self.sent * 1000, 1) if self.sent else 0
+            ),
+            "send_latency_max_ms": round(self._latency_max * 1000, 1),
+        }
+
+
+# Instancia global del despachador de salida
+outbound_dispatcher = OutboundDispatcher(
+    rate_per_second=settings.WHATSAPP_SEND_RATE_PER_SECOND,
+    burst=settings.WHATSAPP_SEND_BURST,
+    max_attempts=settings.WHATSAPP_SEND_MAX_ATTEMPTS,
+    backoff_base=settings.WHATSAPP_SEND_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.WHATSAPP_SEND_BACKOFF_MAX_SECONDS,
+)
@@ -1,14 +1,24 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.services.menu_encoding_service import encode_menu, get_menu_encoder
+from app.services.menu_retrieval_service import (
+    menu_index_cache,
+    retrieval_query,
+    retrieve_menu,
+    use_menu_retrieval,
+)
+from app.services.menu_snapshot_service import MenuSnapshot
 from app.services.tenant_service import get_tenant_details
 
 
-async def prepare_prompt(db: AsyncSession, context: dict, tenant_id: int) -> str:
+def render_prompt_prefix(tenant_data: dict, menu, menu_version: str) -> str:
     """
-    Prepara el prompt para el chatbot con instrucciones detalladas.
+    Construye la parte fija del prompt: instrucciones, datos del tenant y menú.
     """
-    tenant_data = await get_tenant_details(db, tenant_id)
-    
     prompt = (
         "**A lo largo de esta conversación, por favor detecta el idioma en el que te pregunto y responde en ese mismo idioma.**\n\n"
         f"Eres {tenant_data['waiter_name']} presentate la primera vez, trabajas en y seras la persona que atienda en {tenant_data['business_name']} mencionalo siempre."
@@ -24,7 +34,7 @@ async def prepare_prompt(db: AsyncSession, context: dict, tenant_id: int) -> str
         "2. Enlace a la Carta Digital del Restaurante: Si desea ver nuestra carta digital, puede hacerlo en el siguiente enlace: "
         "https://flipdish.blob.core.windows.net/pub/elmundodelcampero.pdf\n\n"
         
-        "Trabajas exclusivamente con la información que se te proporciona en el menú JSON. "
+        "Trabajas exclusivamente con la información que se te proporciona en la carta. "
         "**No inventes platos, precios ni ingredientes.**\n\n"
         "Reglas de atención:\n"
         
@@ -33,10 +43,10 @@ async def prepare_prompt(db: AsyncSession, context: dict, tenant_id: int) -> str
         "- No continues la conversación hasta que te diga el numero de mesa.\n"
         "- Ayuda al cliente a explorar el menú y toma nota de sus pedidos.\n"
         "- Si te piden el menu o la carta, solo di las categorias generales. No todo el menu.\n"
-        "- Si el cliente menciona modificaciones (sin cebolla, extra queso, etc.), anótalas correctamente basandote en el JSON y lo que esta disponible.\n"
-        "- Puedes responder preguntas sobre los platos basándote únicamente en el JSON del menú.\n"
+        "- Si el cliente menciona modificaciones (sin cebolla, extra queso, etc.), anótalas correctamente basandote en la carta y lo que esta disponible.\n"
+        "- Puedes responder preguntas sobre los platos basándote únicamente en la carta.\n"
         "- No confirmes pedidos hasta que el cliente lo indique.\n"
-        "- **No inventes información. Si un cliente solicita un ingrediente o un plato no disponible en el JSON, simplemente indícale que no está en el menú.**\n"
+        "- **No inventes información. Si un cliente solicita un ingrediente o un plato no disponible en la carta, simplemente indícale que no está en el menú.**\n"
         "- Una vez el cliente finaliza el pedido, genera un resumen estandarizado con este formato:\n"
         "- **Asegúrate de calcular bien el total sumando todos los extras, platos y bebidas\n**"
         "- **Asegúrate de que siempre que hagas el Resumen del Pedido, poner Plato 1, Plato 2 o Bebida 1 segun corresponda. Es importante.\n**"
@@ -56,12 +66,132 @@ async def prepare_prompt(db: AsyncSession, context: dict, tenant_id: int) -> str
         "  ❤️ Muchas gracias por su pedido ❤️\n"
         "\n"
         "Este formato es clave para procesar los pedidos en la base de datos.\n\n"
-        "Aquí tienes el menú en formato JSON:\n"
     )
-    prompt += f"{context.get('menu', {})}\n\n"
-    prompt += "Aquí está el historial de la conversación:\n"
-
-    for entry in context.get("conversation", []):
-        prompt += f"Usuario: {entry['user']}\nBot: {entry['bot']}\n"
+    if use_menu_retrieval(menu, tenant_data["menu_prompt_mode"]):
+        # Menú grande: solo las categorías; los platos van en cada turno
+        categories = menu_index_cache.get(menu, menu_version).categories
+        prompt += (
+            f"La carta tiene estas categorías: {', '.join(categories)}.\n"
+            "En cada turno, justo antes del mensaje del cliente, recibirás los "
+            "platos de la carta relevantes para ese mensaje (o la carta completa). "
+            "Trabaja solo con esos platos.\n"
+        )
+    else:
+        prompt += f"{encode_menu(menu, menu_version)}\n"
 
     return prompt
+
+
+class PromptPrefixCache:
+    """
+    Caché LRU del prefijo fijo del prompt por (tenant, versión del menú).
+
+    El prefijo es idéntico byte a byte entre turnos, de modo que el caché de
+    prompts del proveedor lo reutiliza. Se guarda junto con los datos del
+    tenant con los que se construyó: si el tenant se edita, el prefijo se
+    reconstruye cuando el registro de tenants lo recarga (como mucho
+    `TENANT_CACHE_TTL_SECONDS` después).
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tenant_id: int, menu_version: str, tenant_data: dict, menu) -> str:
+        key = (tenant_id, menu_version)
+        entry = self._entries.get(key)
+        if entry and entry[0] == tenant_data:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        prefix = render_prompt_prefix(tenant_data, menu, menu_version)
+        self._entries[key] = (tenant_data, prefix)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return prefix
+
+    def invalidate(self, tenant_id: int):
+        """
+        Descarta los prefijos de un tenant (p. ej. tras subir un menú nuevo).
+        """
+        for key in [key for key in self._entries if key[0] == tenant_id]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Instancia global del caché de prefijos de prompt
+prompt_prefix_cache = PromptPrefixCache(max_size=settings.PROMPT_PREFIX_CACHE_SIZE)
+
+
+async def prepare_prompt(
+    db: AsyncSession, snapshot: MenuSnapshot, tenant_id: int
+) -> str:
+    """
+    Devuelve el prompt de sistema (instrucciones y menú) de la sesión.
+    El historial no va aquí: se envía como turnos con `build_messages`.
+    """
+    tenant_data = await get_tenant_details(db, tenant_id)
+    return prompt_prefix_cache.get(
+        tenant_id, snapshot.version, tenant_data, snapshot.menu
+    )
+
+
+def prepare_menu_message(
+    snapshot: MenuSnapshot,
+    menu_prompt_mode: str,
+    context: dict,
+    turns: List[Dict],
+    user_message: str,
+) -> Optional[str]:
+    """
+    Platos del menú para este turno cuando el menú es grande y el tenant usa
+    el modo "retrieval"; None si el menú completo ya va en el prompt fijo.
+    """
+    menu, menu_version = snapshot.menu, snapshot.version
+    if not use_menu_retrieval(menu, menu_prompt_mode):
+        return None
+
+    query = retrieval_query(context, turns, user_message)
+    selected = retrieve_menu(menu, menu_version, query)
+    if selected is None:
+        # Poca confianza: mejor enviar la carta completa que inventar platos
+        return encode_menu(menu, menu_version)
+
+    encoder = get_menu_encoder(settings.MENU_ENCODER)
+    return (
+        "Platos de la carta relevantes para este mensaje "
+        "(pueden existir otros en la carta):\n"
+        f"{encoder.encode(selected)}"
+    )
+
+
+def build_messages(
+    prompt: str,
+    history: List[Dict[str, str]],
+    user_message: str,
+    menu_message: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    """
+    Mensajes para el chat: prompt de sistema, historial, platos del turno
+    (si los hay) y mensaje actual.
+    """
+    menu_messages = (
+        [{"role": "system", "content": menu_message}] if menu_message else []
+    )
+    return (
+        [{"role": "system", "content": prompt}]
+        + history
+        + menu_messages
+        + [{"role": "user", "content": user_message}]
+    )
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.core.dependencies import async_session
+from app.models.whatsapp import (
+    QUEUE_STATUS_DONE,
+    QUEUE_STATUS_FAILED,
+    InboundMessage,
+    ProcessedMessage,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def _delete_in_batches(key_column, condition, batch_size: int) -> int:
+    """
+    Borra las filas que cumplen `condition` en lotes de `batch_size`, cada uno
+    en su propia transacción, para no bloquear la tabla ni el event loop.
+    """
+    table = key_column.class_
+    removed = 0
+    while True:
+        async with async_session() as db:
+            result = await db.execute(
+                delete(table).where(
+                    key_column.in_(
+                        select(key_column).where(condition).limit(batch_size)
+                    )
+                )
+            )
+            await db.commit()
+
+        deleted = result.rowcount or 0
+        removed += deleted
+        if deleted < batch_size:
+            return removed
+
+        await asyncio.sleep(0)  # Ceder el turno entre lotes
+
+
+async def prune_expired_messages(
+    retention: timedelta, batch_size: int
+) -> Dict[str, int]:
+    """
+    Elimina los `ProcessedMessage` caducados y los mensajes ya terminados de
+    la cola de entrada. Devuelve cuántas filas se borraron de cada tabla.
+    """
+    cutoff = datetime.now(timezone.utc) - retention
+
+    processed = await _delete_in_batches(
+        ProcessedMessage.message_id, ProcessedMessage.created_at < cutoff, batch_size
+    )
+    inbound = await _delete_in_batches(
+        InboundMessage.id,
+        (InboundMessage.created_at < cutoff)
+        & InboundMessage.status.in_([QUEUE_STATUS_DONE, QUEUE_STATUS_FAILED]),
+        batch_size,
+    )
+
+    return {"processed_messages": processed, "inbound_messages": inbound}
+
+
+class RetentionTask:
+    """
+    Tarea en segundo plano que ejecuta `prune_expired_messages` cada
+    `interval_seconds`.
+    """
+
+    def __init__(self, retention: timedelta, interval_seconds: int, batch_size: int):
+        self.retention = retention
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.last_result: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, int]:
+        self.last_result = await prune_expired_messages(self.retention, self.batch_size)
+        logger.info(f"🧹 Limpieza de mensajes completada: {self.last_result}")
+        return self.last_result
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Error en la limpieza de mensajes: {e}", exc_info=True)
+
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop(), name="retention-task")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+# Instancia global de la tarea de limpieza
+retention_task = RetentionTask(
+    retention=timedelta(hours=settings.PROCESSED_MESSAGES_RETENTION_HOURS),
+    interval_seconds=settings.RETENTION_INTERVAL_SECONDS,
+    batch_size=settings.RETENTION_BATCH_SIZE,
+)
@@ -1,34 +1,54 @@
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.sessions import Session
-from app.services.context_manager_service import initialize_context
-from app.services.menu_service import fetch_menu_as_json
+from app.services.context_manager_service import (
+    initialize_context,
+    session_context_cache,
+)
+from app.services.conversation_service import turn_store
+from app.services.menu_service import menu_cache
+from app.services.menu_snapshot_service import menu_snapshots
 
 
-async def get_or_create_session(user_id: str, tenant_id: int, db: AsyncSession):
-    """
-    Busca una sesión activa para el usuario o crea una nueva.
-    """
+async def _find_active_session(user_id: str, tenant_id: int, db: AsyncSession):
     result = await db.execute(
         select(Session).filter(
             Session.user_id == user_id, Session.active, Session.tenant_id == tenant_id
         )
     )
-    session = result.scalar()
+    return result.scalar()
+
+
+async def get_or_create_session(user_id: str, tenant_id: int, db: AsyncSession):
+    """
+    Busca una sesión activa para el usuario o crea una nueva.
+    """
+    session = await _find_active_session(user_id, tenant_id, db)
 
     if not session:
-        menu = await fetch_menu_as_json(tenant_id, db)
+        menu = await menu_cache.get(db, tenant_id)
+        snapshot = await menu_snapshots.store(db, tenant_id, menu.menu, menu.payload)
 
         session = Session(
             user_id=user_id,
             tenant_id=tenant_id,
-            context=await initialize_context({"menu": menu}),
+            menu_version_id=snapshot.id,
+            context=await initialize_context(snapshot),
             active=True,
         )
         db.add(session)
-        await db.commit()
-        await db.refresh(session)
+        try:
+            await db.commit()
+            await db.refresh(session)
+        except IntegrityError:
+            # Otra petición creó la sesión a la vez (uq_sessions_active_user)
+            await db.rollback()
+            session = await _find_active_session(user_id, tenant_id, db)
+
+    # Dejar el contexto decodificado en caché para el resto del turno
+    session_context_cache.prime(session)
 
     return session
 
@@ -37,15 +57,13 @@ async def close_session(user_id: str, tenant_id: int, db: AsyncSession):
     """
     Marca la sesión como inactiva y actualiza los registros relacionados.
     """
-    result = await db.execute(
-        select(Session).filter(
-            Session.user_id == user_id, Session.active, Session.tenant_id == tenant_id
-        )
-    )
-    session = result.scalar()
+    session = await _find_active_session(user_id, tenant_id, db)
 
     if session:
         print("🎉🎉🎉🎉🎉🎉🎉🎉🎉🎉🎉🎉🎉Cerrando sesión...")
+        # Guardar el contexto pendiente antes de desactivar la sesión
+        await session_context_cache.discard(session.id)
+        turn_store.discard(session.id)
         session.active = False
 
         await db.commit()
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, case, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.dependencies import async_session
+from app.models.sessions import ConversationTurn, Session, SessionArchive
+from app.services.context_manager_service import session_context_cache
+from app.services.conversation_service import turn_store
+from app.services.tenant_registry_service import TenantRecord, tenant_registry
+
+logger = logging.getLogger(__name__)
+
+
+def _cutoff_by_tenant(
+    tenants: List[TenantRecord], now: datetime, default_minutes: int, naive: bool
+):
+    """
+    Expresión con el límite de inactividad de cada sesión según su tenant
+    (`CASE tenant_id WHEN ... END`), o un único valor si ningún tenant tiene
+    un tiempo propio.
+    """
+
+    def cutoff(minutes: int) -> datetime:
+        moment = now - timedelta(minutes=minutes)
+        return moment.replace(tzinfo=None) if naive else moment
+
+    custom = {
+        tenant.id: cutoff(tenant.session_idle_minutes)
+        for tenant in tenants
+        if tenant.session_idle_minutes
+    }
+    if not custom:
+        return cutoff(default_minutes)
+    return case(custom, value=Session.tenant_id, else_=cutoff(default_minutes))
+
+
+def idle_condition(tenants: List[TenantRecord], now: datetime, default_minutes: int):
+    """
+    Sesión sin actividad desde su límite: la actividad es el último turno de
+    la conversación o, si aún no tiene ninguno, la creación de la sesión.
+    """
+    last_turn_at = (
+        select(ConversationTurn.created_at)
+        .where(ConversationTurn.session_id == Session.id)
+        .order_by(ConversationTurn.seq.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return or_(
+        last_turn_at < _cutoff_by_tenant(tenants, now, default_minutes, naive=False),
+        and_(
+            last_turn_at.is_(None),
+            Session.created_at
+            < _cutoff_by_tenant(tenants, now, default_minutes, naive=True),
+        ),
+    )
+
+
+async def reap_idle_sessions(db: AsyncSession, default_minutes: int) -> Dict[str, int]:
+    """
+    Cierra las sesiones inactivas con un único UPDATE ... RETURNING y mueve
+    su contexto, comprimido, a `session_archives`. Devuelve cuántas sesiones
+    se cerraron y cuántos bytes de contexto se liberaron.
+    """
+    # Que no quede en la caché ningún contexto pendiente de escribir
+    await session_context_cache.flush()
+
+    tenants = await tenant_registry.all(db)
+    now = datetime.now(timezone.utc)
+
+    result = await db.execute(
+        update(Session)
+        .where(Session.active, idle_condition(tenants, now, default_minutes))
+        .values(active=False)
+        .returning(Session.id, Session.tenant_id, Session.context)
+        .execution_options(synchronize_session=False)
+    )
+    closed = result.all()
+    if not closed:
+        await db.commit()
+        return {"sessions_closed": 0, "bytes_archived": 0, "bytes_reclaimed": 0}
+
+    archives = []
+    for session_id, tenant_id, context in closed:
+        if not context:
+            continue
+        raw = context.encode()
+        archives.append(
+            {
+                "session_id": session_id,
+                "tenant_id": tenant_id,
+                "context": zlib.compress(raw),
+                "original_bytes": len(raw),
+            }
+        )
+
+    if archives:
+        await db.execute(insert(SessionArchive), archives)
+        await db.execute(
+            update(Session)
+            .where(Session.id.in_([row["session_id"] for row in archives]))
+            .values(context=None)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+    # Un turno que termine antes de `forget` puede volver a marcar el contexto;
+    # `flush` solo escribe en sesiones activas, así que no pisa el archivo
+    session_ids = [session_id for session_id, _, _ in closed]
+    session_context_cache.forget(session_ids)
+    for session_id in session_ids:
+        turn_store.discard(session_id)
+
+    original = sum(row["original_bytes"] for row in archives)
+    compressed = sum(len(row["context"]) for row in archives)
+    return {
+        "sessions_closed": len(closed),
+        "bytes_archived": compressed,
+        "bytes_reclaimed": original - compressed,
+    }
+
+
+async def archived_context(db: AsyncSession, session_id: int) -> Optional[dict]:
+    """
+    Contexto de una sesión archivada por inactividad, o None.
+    """
+    archive = await db.get(SessionArchive, session_id)
+    if archive is None:
+        return None
+    return json.loads(zlib.decompress(archive.context))
+
+
+class SessionReaper:
+    """
+    Tarea en segundo plano que ejecuta `reap_idle_sessions` cada
+    `interval_seconds`.
+    """
+
+    def __init__(self, default_minutes: int, interval_seconds: int):
+        self.default_minutes = default_minutes
+        self.interval_seconds = interval_seconds
+        self.last_result: Dict[str, int] = {}
+        self.sessions_closed = 0
+        self.bytes_reclaimed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Dict[str, int]:
+        async with async_session() as db:
+            self.last_result = await reap_idle_sessions(db, self.default_minutes)
+
+        self.sessions_closed += self.last_result["sessions_closed"]
+        self.bytes_reclaimed += self.last_result["bytes_reclaimed"]
+        if self.last_result["sessions_closed"]:
+            logger.info(f"💤 Sesiones inactivas cerradas: {self.last_result}")
+        return self.last_result
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    f"❌ Error cerrando sesiones inactivas: {e}", exc_info=True
+                )
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop(), name="session-reaper")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "last_run": self.last_result,
+            "sessions_closed": self.sessions_closed,
+            "bytes_reclaimed": self.bytes_reclaimed,
+        }
+
+
+# Instancia global del cierre de sesiones inactivas
+session_reaper = SessionReaper(
+    default_minutes=settings.SESSION_IDLE_MINUTES,
+    interval_seconds=settings.SESSION_REAPER_INTERVAL_SECONDS,
+)
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import settings
+from app.models.tenants import Tenant
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TenantRecord:
+    """
+    Copia inmutable de los campos de un tenant que se usan en caliente.
+    """
+
+    id: int
+    name: str
+    phone_number: str
+    whatsapp_token: str
+    waiter_name: Optional[str]
+    business_name: Optional[str]
+    table_number_min: Optional[int]
+    table_number_max: Optional[int]
+    message_coalesce_ms: Optional[int]
+    history_token_budget: Optional[int]
+    session_idle_minutes: Optional[int]
+    menu_prompt_mode: Optional[str]
+
+    @classmethod
+    def from_model(cls, tenant: Tenant) -> "TenantRecord":
+        return cls(
+            id=tenant.id,
+            name=tenant.name,
+            phone_number=tenant.phone_number,
+            whatsapp_token=tenant.whatsapp_token,
+            waiter_name=tenant.waiter_name,
+            business_name=tenant.business_name,
+            table_number_min=tenant.table_number_min,
+            table_number_max=tenant.table_number_max,
+            message_coalesce_ms=tenant.message_coalesce_ms,
+            history_token_budget=tenant.history_token_budget,
+            session_idle_minutes=tenant.session_idle_minutes,
+            menu_prompt_mode=tenant.menu_prompt_mode,
+        )
+
+
+class TenantRegistry:
+    """
+    Caché en memoria de tenants indexada por teléfono y por id.
+
+    Carga todos los tenants de una vez y los recarga cuando vence el TTL.
+    Un tenant que no está en caché (p. ej. recién creado) se busca con una
+    consulta puntual y se añade.
+
+    La aplicación no edita tenants: se modifican directamente en la base de
+    datos (SQL, migraciones). Un cambio de token, teléfono o personalización
+    tarda hasta `TENANT_CACHE_TTL_SECONDS` en aplicarse en cada proceso, y
+    también el prefijo del prompt que depende de él. Quien añada una forma
+    de editar tenants debe llamar a `invalidate(tenant_id)` tras el commit.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._by_id: Dict[int, TenantRecord] = {}
+        self._by_phone: Dict[str, TenantRecord] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _expired(self) -> bool:
+        return (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at > self.ttl_seconds
+        )
+
+    def _store(self, record: TenantRecord):
+        self._by_id[record.id] = record
+        self._by_phone[record.phone_number] = record
+
+    async def _ensure_fresh(self, db: AsyncSession):
+        if not self._expired():
+            return
+
+        async with self._lock:
+            if not self._expired():  # Otro coroutine ya recargó
+                return
+
+            result = await db.execute(select(Tenant))
+            self._by_id, self._by_phone = {}, {}
+            for tenant in result.scalars().all():
+                self._store(TenantRecord.from_model(tenant))
+
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+            logger.debug(f"🔄 Registro de tenants recargado: {len(self._by_id)}")
+
+    async def _load_one(self, db: AsyncSession, condition) -> Optional[TenantRecord]:
+        result = await db.execute(select(Tenant).where(condition))
+        tenant = result.scalars().first()
+        if not tenant:
+            return None
+
+        record = TenantRecord.from_model(tenant)
+        self._store(record)
+        return record
+
+    async def get_by_phone(
+        self, db: AsyncSession, phone_number: str
+    ) -> Optional[TenantRecord]:
+        """
+        Devuelve el tenant asociado a un número de WhatsApp, o None.
+        """
+        await self._ensure_fresh(db)
+        record = self._by_phone.get(phone_number)
+        if record:
+            self.hits += 1
+            return record
+
+        self.misses += 1
+        return await self._load_one(db, Tenant.phone_number == phone_number)
+
+    async def get_by_id(
+        self, db: AsyncSession, tenant_id: int
+    ) -> Optional[TenantRecord]:
+        """
+        Devuelve el tenant con ese id, o None.
+        """
+        await self._ensure_fresh(db)
+        record = self._by_id.get(tenant_id)
+        if record:
+            self.hits += 1
+            return record
+
+        self.misses += 1
+        return await self._load_one(db, Tenant.id == tenant_id)
+
+    async def all(self, db: AsyncSession) -> List[TenantRecord]:
+        """
+        Devuelve todos los tenants del registro.
+        """
+        await self._ensure_fresh(db)
+        return list(self._by_id.values())
+
+    def invalidate(self, tenant_id: Optional[int] = None):
+        """
+        Descarta un tenant concreto o, sin argumentos, todo el registro.
+        """
+        if tenant_id is None:
+            self._loaded_at = None
+            return
+
+        record = self._by_id.pop(tenant_id, None)
+        if record:
+            self._by_phone.pop(record.phone_number, None)
+
+    def stats(self) -> dict:
+        return {
+            "tenants": len(self._by_id),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+        }
+
+
+# Instancia global del registro de tenants
+tenant_registry = TenantRegistry(ttl_seconds=settings.TENANT_CACHE_TTL_SECONDS)
@@ -1,16 +1,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from fastapi import HTTPException
 
-from app.models.tenants import Tenant
+from app.core.config import settings
+from app.services.tenant_registry_service import tenant_registry
 
 
 async def get_tenant_details(db: AsyncSession, tenant_id: int) -> dict:
     """
     Obtiene los detalles de personalización del tenant para configurar el chatbot.
     """
-    result = await db.execute(select(Tenant).where(Tenant.id == tenant_id))
-    tenant = result.scalars().first()
+    tenant = await tenant_registry.get_by_id(db, tenant_id)
 
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant no encontrado")
@@ -20,4 +19,29 @@ async def get_tenant_details(db: AsyncSession, tenant_id: int) -> dict:
         "business_name": tenant.business_name or "Template Name",
         "table_number_min": tenant.table_number_min or 0,
         "table_number_max": tenant.table_number_max or 10,
+        "menu_prompt_mode": tenant.menu_prompt_mode or settings.MENU_PROMPT_MODE,
     }
+
+
+async def get_message_coalesce_ms(db: AsyncSession, tenant_id: int) -> int:
+    """
+    Ventana de agrupación de mensajes del tenant en milisegundos (0 = desactivada).
+    """
+    tenant = await tenant_registry.get_by_id(db, tenant_id)
+    return (tenant.message_coalesce_ms or 0) if tenant else 0
+
+
+async def get_menu_prompt_mode(db: AsyncSession, tenant_id: int) -> str:
+    """
+    Cómo va el menú en el prompt del tenant: "full" o "retrieval".
+    """
+    tenant = await tenant_registry.get_by_id(db, tenant_id)
+    return (tenant and tenant.menu_prompt_mode) or settings.MENU_PROMPT_MODE
+
+
+async def get_whatsapp_token(db: AsyncSession, tenant_id: int) -> str:
+    """
+    Obtiene el token de WhatsApp del tenant desde el registro en memoria.
+    """
+    tenant = await tenant_registry.get_by_id(db, tenant_id)
+    return tenant.whatsapp_token if tenant else None
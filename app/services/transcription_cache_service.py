@@ -0,0 +1,137 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.whatsapp import AudioTranscription
+from app.services.database_service import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+
+def hash_audio(audio: bytes) -> str:
+    return hashlib.sha256(audio).hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Caché de transcripciones de notas de voz.
+
+    - Por `media_id`: una reentrega del mismo webhook no hace ninguna llamada
+      de red (ni Graph API, ni descarga, ni Whisper).
+    - Por hash del contenido: un audio reenviado (otro `media_id`, mismos
+      bytes) se descarga pero no se vuelve a transcribir.
+
+    Ambos índices son LRU acotados a `max_size` entradas. Con `persist`
+    activado, las transcripciones también se guardan en
+    `audio_transcriptions` y sobreviven a reinicios.
+    """
+
+    def __init__(self, max_size: int, persist: bool):
+        self.max_size = max_size
+        self.persist = persist
+        self._by_media: OrderedDict = OrderedDict()  # media_id -> hash
+        self._by_hash: OrderedDict = OrderedDict()  # hash -> texto
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, media_id: Optional[str], content_hash: str, text: str):
+        self._by_hash[content_hash] = text
+        self._by_hash.move_to_end(content_hash)
+        if media_id:
+            self._by_media[media_id] = content_hash
+            self._by_media.move_to_end(media_id)
+
+        for index in (self._by_hash, self._by_media):
+            while len(index) > self.max_size:
+                index.popitem(last=False)
+
+    async def get_by_media(self, db: AsyncSession, media_id: str) -> Optional[str]:
+        """
+        Devuelve la transcripción de un `media_id` ya visto, o None.
+        """
+        content_hash = self._by_media.get(media_id)
+        if content_hash and content_hash in self._by_hash:
+            self._by_media.move_to_end(media_id)
+            self._by_hash.move_to_end(content_hash)
+            self.hits += 1
+            return self._by_hash[content_hash]
+
+        if self.persist:
+            result = await db.execute(
+                select(AudioTranscription).where(
+                    AudioTranscription.media_id == media_id
+                )
+            )
+            row = result.scalars().first()
+            if row:
+                self._remember(media_id, row.content_hash, row.text)
+                self.hits += 1
+                return row.text
+
+        return None
+
+    async def get_by_hash(
+        self, db: AsyncSession, content_hash: str, media_id: str = None
+    ) -> Optional[str]:
+        """
+        Devuelve la transcripción de un audio con el mismo contenido, o None.
+        """
+        text = self._by_hash.get(content_hash)
+        if text is None and self.persist:
+            row = await db.get(AudioTranscription, content_hash)
+            text = row.text if row else None
+
+        if text is None:
+            self.misses += 1
+            return None
+
+        self._remember(media_id, content_hash, text)
+        self.hits += 1
+        return text
+
+    async def put(
+        self,
+        db: AsyncSession,
+        tenant_id: int,
+        media_id: str,
+        content_hash: str,
+        text: str,
+    ):
+        self._remember(media_id, content_hash, text)
+
+        if self.persist:
+            try:
+                await db.execute(
+                    dialect_insert(db, AudioTranscription)
+                    .values(
+                        content_hash=content_hash,
+                        media_id=media_id,
+                        tenant_id=tenant_id,
+                        text=text,
+                    )
+                    .on_conflict_do_nothing(index_elements=["content_hash"])
+                )
+                await db.commit()
+
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"❌ Error guardando la transcripción: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._by_hash),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Instancia global de la caché de transcripciones
+transcription_cache = TranscriptionCache(
+    max_size=settings.TRANSCRIPTION_CACHE_SIZE,
+    persist=settings.TRANSCRIPTION_CACHE_PERSIST,
+)
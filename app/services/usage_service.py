@@ -0,0 +1,169 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case
+
+from app.core.config import settings
+from app.core.dependencies import async_session
+from app.models.usage import LLMUsage
+from app.services.database_service import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+UsageKey = Tuple[int, int, date, str]  # (tenant_id, session_id, día, modelo)
+
+
+@dataclass
+class UsageCounters:
+    calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms_total: int = 0
+    latency_ms_max: int = 0
+
+    def add(self, other: "UsageCounters"):
+        self.calls += other.calls
+        self.prompt_tokens += other.prompt_tokens
+        self.cached_tokens += other.cached_tokens
+        self.completion_tokens += other.completion_tokens
+        self.latency_ms_total += other.latency_ms_total
+        self.latency_ms_max = max(self.latency_ms_max, other.latency_ms_max)
+
+
+def usage_from_response(response) -> UsageCounters:
+    """
+    Tokens de la respuesta de OpenAI (las transcripciones no traen `usage`).
+    """
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return UsageCounters(calls=1)
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    return UsageCounters(
+        calls=1,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        cached_tokens=(getattr(details, "cached_tokens", 0) or 0) if details else 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+    )
+
+
+class UsageTracker:
+    """
+    Acumula en memoria el consumo de cada llamada a OpenAI y lo vuelca cada
+    `flush_interval_seconds` a `llm_usage` con un único upsert por lote.
+    """
+
+    def __init__(self, flush_interval_seconds: int):
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending: Dict[UsageKey, UsageCounters] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_rows = 0
+
+    def record(
+        self,
+        tenant_id: int,
+        session_id: Optional[int],
+        model: str,
+        response,
+        latency_seconds: float,
+    ):
+        counters = usage_from_response(response)
+        latency_ms = round(latency_seconds * 1000)
+        counters.latency_ms_total = latency_ms
+        counters.latency_ms_max = latency_ms
+
+        key = (tenant_id, session_id or 0, datetime.now(timezone.utc).date(), model)
+        self._pending.setdefault(key, UsageCounters()).add(counters)
+
+    async def flush(self) -> int:
+        """
+        Vuelca lo acumulado. Si falla, lo devuelve a memoria para el siguiente
+        intento. Devuelve el número de filas escritas.
+        """
+        async with self._lock:
+            batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            table = LLMUsage.__table__
+            try:
+                async with async_session() as db:
+                    statement = dialect_insert(db, LLMUsage).values(
+                        [
+                            {
+                                "tenant_id": tenant_id,
+                                "session_id": session_id,
+                                "day": day,
+                                "model": model,
+                                **counters.__dict__,
+                            }
+                            for (tenant_id, session_id, day, model), counters in (
+                                batch.items()
+                            )
+                        ]
+                    )
+                    excluded = statement.excluded
+                    await db.execute(
+                        statement.on_conflict_do_update(
+                            index_elements=["tenant_id", "session_id", "day", "model"],
+                            set_={
+                                "calls": table.c.calls + excluded.calls,
+                                "prompt_tokens": table.c.prompt_tokens
+                                + excluded.prompt_tokens,
+                                "cached_tokens": table.c.cached_tokens
+                                + excluded.cached_tokens,
+                                "completion_tokens": table.c.completion_tokens
+                                + excluded.completion_tokens,
+                                "latency_ms_total": table.c.latency_ms_total
+                                + excluded.latency_ms_total,
+                                "latency_ms_max": case(
+                                    (
+                                        excluded.latency_ms_max
+                                        > table.c.latency_ms_max,
+                                        excluded.latency_ms_max,
+                                    ),
+                                    else_=table.c.latency_ms_max,
+                                ),
+                            },
+                        )
+                    )
+                    await db.commit()
+
+            except Exception as e:
+                logger.error(f"❌ Error guardando el consumo de OpenAI: {e}")
+                for key, counters in batch.items():
+                    self._pending.setdefault(key, UsageCounters()).add(counters)
+                return 0
+
+            self.flushed_rows += len(batch)
+            logger.debug(f"📊 Consumo de OpenAI guardado: {len(batch)} filas")
+            return len(batch)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop(), name="usage-flush")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {"pending_rows": len(self._pending), "flushed_rows": self.flushed_rows}
+
+
+# Instancia global del contador de consumo
+usage_tracker = UsageTracker(
+    flush_interval_seconds=settings.USAGE_FLUSH_INTERVAL_SECONDS
+)
@@ -1,18 +1,17 @@
+import httpx
 import logging
-import openai
-import os
 import re
-import requests
 
 from decimal import Decimal
 from fastapi import HTTPException
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from urllib.parse import urlencode
 
 from app.core.config import settings
-from app.models.tenants import Tenant
+from app.services.audio_service import get_audio_url, transcribe_audio
+from app.services.context_manager_service import update_context
 from app.services.database_service import DatabaseService
+from app.services.http_client_service import get_http_client
 from app.services.log_manager_service import save_message_log
 from app.services.openai_service import generate_openai_response
 from app.services.order_service import create_order
@@ -20,6 +19,8 @@ from app.services.session_manager_service import (
     close_session,
     get_or_create_session,
 )
+from app.services.tenant_service import get_whatsapp_token
+from app.services.transcription_cache_service import transcription_cache
 
 # 🔥 Configuración del Logger
 logger = logging.getLogger("whatsapp_service")
@@ -30,8 +31,73 @@ if not logger.handlers:
     handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
     logger.addHandler(handler)
 
-# Configurar la API de OpenAI
-openai.api_key = settings.OPENAI_API_KEY
+
+class MessageJob:
+    """
+    Trabajo del planificador de conversaciones: uno o varios mensajes
+    consecutivos de un mismo cliente.
+
+    Si el tenant tiene ventana de agrupación (`coalesce_ms`), el planificador
+    fusiona los trabajos que llegan dentro de la ventana y se responden como
+    un único turno. `tags` identifica a cada mensaje original (p. ej. la fila
+    de la cola) y `on_complete(tags, error)` se llama al terminar. Con
+    `raise_errors` los fallos se propagan (y llegan a `on_complete`) en vez
+    de solo registrarse.
+    """
+
+    def __init__(
+        self,
+        from_number: str,
+        message_bodies: list,
+        tenant_id: int,
+        coalesce_ms: int = 0,
+        tags: list = None,
+        on_complete=None,
+        raise_errors: bool = False,
+    ):
+        self.from_number = from_number
+        self.message_bodies = message_bodies
+        self.tenant_id = tenant_id
+        self.coalesce_ms = coalesce_ms
+        self.tags = tags or []
+        self.on_complete = on_complete
+        self.raise_errors = raise_errors
+
+    def can_merge(self, other) -> bool:
+        return (
+            isinstance(other, MessageJob)
+            and other.coalesce_ms > 0
+            and other.on_complete == self.on_complete
+            and other.raise_errors == self.raise_errors
+        )
+
+    def merge(self, jobs: list) -> "MessageJob":
+        return MessageJob(
+            self.from_number,
+            [body for job in jobs for body in job.message_bodies],
+            self.tenant_id,
+            self.coalesce_ms,
+            [tag for job in jobs for tag in job.tags],
+            self.on_complete,
+            self.raise_errors,
+        )
+
+    async def __call__(self, db: AsyncSession):
+        error = None
+        try:
+            await process_whatsapp_messages(
+                self.from_number,
+                self.message_bodies,
+                self.tenant_id,
+                db,
+                raise_errors=self.raise_errors,
+            )
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if self.on_complete:
+                await self.on_complete(self.tags, error)
 
 
 async def process_whatsapp_message(
@@ -40,36 +106,69 @@ async def process_whatsapp_message(
     """
     Procesa un mensaje de WhatsApp (texto o audio) y maneja la lógica de respuesta.
     """
+    await process_whatsapp_messages(from_number, [message_body], tenant_id, db)
+
+
+async def process_whatsapp_messages(
+    from_number: str,
+    message_bodies: list,
+    tenant_id: int,
+    db: AsyncSession,
+    raise_errors: bool = False,
+):
+    """
+    Procesa uno o varios mensajes consecutivos de WhatsApp (texto o audio)
+    como un único turno: una llamada a OpenAI, un log y una respuesta.
+
+    Los errores se registran y se descartan, salvo con `raise_errors`: la
+    cola duradera necesita la excepción para reintentar el mensaje.
+    """
     from app.routes.whatsapp import send_whatsapp_message
 
     try:
-        if isinstance(message_body, dict) and message_body.get("type") == "audio":
-            media_id = message_body["media_id"]
-
-            # Obtener URL del audio
-            audio_url = await get_audio_url(media_id, tenant_id, db)
-            if not audio_url:
-                await send_whatsapp_message(
-                    from_number, "No se pudo obtener el audio.", tenant_id, db
-                )
-                return
+        # Buscar o crear sesión (antes de transcribir, para atribuirle el consumo)
+        session = await get_or_create_session(from_number, tenant_id, db)
+
+        texts = []
+        for message_body in message_bodies:
+            if isinstance(message_body, dict) and message_body.get("type") == "audio":
+                media_id = message_body["media_id"]
+
+                # Audio ya transcrito (p. ej. webhook reentregado): sin red
+                cached_text = await transcription_cache.get_by_media(db, media_id)
+                if cached_text:
+                    texts.append(cached_text)
+                    continue
+
+                # Obtener URL del audio
+                audio_url = await get_audio_url(media_id, tenant_id, db)
+                if not audio_url:
+                    await send_whatsapp_message(
+                        from_number, "No se pudo obtener el audio.", tenant_id
+                    )
+                    continue
 
-            # Transcribir el audio
-            transcribed_text = await transcribe_audio(audio_url, tenant_id, db)
-            if not transcribed_text:
-                await send_whatsapp_message(
-                    from_number, "No se pudo transcribir el audio.", tenant_id, db
+                # Transcribir el audio
+                transcribed_text = await transcribe_audio(
+                    audio_url, tenant_id, db, media_id=media_id, session_id=session.id
                 )
-                return
+                if not transcribed_text:
+                    await send_whatsapp_message(
+                        from_number, "No se pudo transcribir el audio.", tenant_id
+                    )
+                    continue
 
-            # Usamos la transcripción como el mensaje del usuario
-            message_body = transcribed_text
+                # Usamos la transcripción como el mensaje del usuario
+                texts.append(transcribed_text)
 
-        else:
-            message_body = message_body.strip()
+            else:
+                texts.append(message_body.strip())
 
-        # Buscar o crear sesión
-        session = await get_or_create_session(from_number, tenant_id, db)
+        if not texts:
+            return
+
+        # Los mensajes agrupados se envían como un único turno del usuario
+        message_body = "\n".join(texts)
 
         # Obtener respuesta de OpenAI
         bot_response = await generate_openai_response(
@@ -81,6 +180,14 @@ async def process_whatsapp_message(
             parsed_order = parse_order_details(bot_response)
 
             if parsed_order:
+                # Pedido abierto de la sesión (hasta que se pague y se cierre)
+                await update_context(
+                    session.id,
+                    {"current_order": order_cart(parsed_order)},
+                    tenant_id,
+                    db,
+                )
+
                 # Guardar el pedido en la base de datos
                 # (no iniciar nueva transacción si ya hay una activa)
                 if not db.in_transaction():
@@ -121,22 +228,24 @@ async def process_whatsapp_message(
                     )
 
                     await send_whatsapp_message(
-                        from_number, confirmation_msg, tenant_id, db
+                        from_number, confirmation_msg, tenant_id
                     )
 
                 else:
                     await send_whatsapp_message(
-                        from_number, "❌ Error al registrar el pedido.", tenant_id, db
+                        from_number, "❌ Error al registrar el pedido.", tenant_id
                     )
 
         # Guardar en el historial de conversación
         await save_message_log(session.id, message_body, bot_response, tenant_id, db)
 
         # Enviar respuesta al usuario
-        await send_whatsapp_message(from_number, bot_response, tenant_id, db)
+        await send_whatsapp_message(from_number, bot_response, tenant_id)
 
     except Exception as e:
         logger.error(f"❌ Error procesando mensaje de WhatsApp: {e}", exc_info=True)
+        if raise_errors:
+            raise
 
 
 async def send_message(to: str, body: str, tenant_id: int, db: AsyncSession):
@@ -147,10 +256,7 @@ async def send_message(to: str, body: str, tenant_id: int, db: AsyncSession):
         logger.info(f"📩 Enviando mensaje a {to} desde tenant_id {tenant_id}...")
 
         # 🔍 Obtener el token de WhatsApp del tenant
-        result = await db.execute(
-            select(Tenant.whatsapp_token).where(Tenant.id == tenant_id)
-        )
-        whatsapp_token = result.scalar_one_or_none()
+        whatsapp_token = await get_whatsapp_token(db, tenant_id)
 
         if not whatsapp_token:
             logger.error(
@@ -177,7 +283,7 @@ async def send_message(to: str, body: str, tenant_id: int, db: AsyncSession):
         logger.debug(f"🔍 Payload enviado: {payload}")
         logger.debug(f"🔍 Headers enviados: {headers}")
 
-        response = requests.post(url, json=payload, headers=headers)
+        response = await get_http_client().post(url, json=payload, headers=headers)
 
         logger.debug(
             f"🔍 Respuesta de WhatsApp API: {response.status_code} - {response.text}"
@@ -192,11 +298,35 @@ async def send_message(to: str, body: str, tenant_id: int, db: AsyncSession):
 
         logger.info(f"✅ Mensaje enviado correctamente a {to}")
 
+    except HTTPException:
+        # Se conserva el código de Meta para que el despachador decida si reintenta
+        raise
+
+    except httpx.HTTPError as e:
+        logger.error(f"❌ Error de red en send_message: {e}")
+        raise HTTPException(status_code=503, detail=f"Error enviando mensaje: {str(e)}")
+
     except Exception as e:
         logger.error(f"❌ Error en send_message: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error enviando mensaje: {str(e)}")
 
 
+def order_cart(order_data: dict) -> list:
+    """
+    Pedido abierto tal como se guarda en el contexto (`current_order`):
+    nombre, cantidad, extras y exclusiones de cada línea, sin importes.
+    """
+    return [
+        {
+            "nombre": item["nombre"],
+            "cantidad": item["cantidad"],
+            "extras": [extra["nombre"] for extra in item["extras"]],
+            "sin": item["sin"],
+        }
+        for item in order_data["pedido"]
+    ]
+
+
 def parse_order_details(order_text: str) -> dict:
     """
     Extrae los datos de un resumen de pedido y los convierte a JSON,
@@ -292,75 +422,3 @@ def parse_order_details(order_text: str) -> dict:
     except Exception as e:
         logger.error(f"❌ Error al parsear el pedido: {e}", exc_info=True)
         return {}  # Retorna un JSON vacío si hay un error
-
-
-async def get_audio_url(media_id: str, tenant_id: int, db: AsyncSession) -> str:
-    """
-    Obtiene la URL de descarga del archivo de audio desde WhatsApp API.
-    """
-    try:
-        result = await db.execute(
-            select(Tenant.whatsapp_token).where(Tenant.id == tenant_id)
-        )
-        whatsapp_token = result.scalar_one_or_none()
-        
-        
-        url = f"https://graph.facebook.com/{settings.WHATSAPP_VERSION_API}/{media_id}"
-        headers = {"Authorization": f"Bearer {whatsapp_token}"}
-
-        response = requests.get(url, headers=headers)
-        response_data = response.json()
-
-        if response.status_code != 200:
-            logger.error(f"❌ Error obteniendo URL del audio: {response_data}")
-            return None
-
-        audio_url = response_data.get("url")
-
-        return audio_url
-
-    except Exception as e:
-        logger.error(f"❌ Excepción en get_audio_url: {e}", exc_info=True)
-        return None
-
-
-async def transcribe_audio(audio_url: str, tenant_id: int, db: AsyncSession) -> str:
-    """
-    Transcribe un archivo de audio a texto utilizando OpenAI Whisper.
-    """
-    try:
-        result = await db.execute(
-            select(Tenant.whatsapp_token).where(Tenant.id == tenant_id)
-        )
-        whatsapp_token = result.scalar_one_or_none()
-        
-        # Descargar el archivo de audio con autenticación
-        headers = {"Authorization": f"Bearer {whatsapp_token}"}
-        response = requests.get(audio_url, headers=headers)
-
-        if response.status_code != 200:
-            logger.error(f"❌ Error al descargar el audio: {response.status_code}")
-            return None
-
-        audio_path = "temp_audio.ogg"
-        with open(audio_path, "wb") as f:
-            f.write(response.content)
-
-        # Enviar a OpenAI Whisper
-        with open(audio_path, "rb") as f:
-            transcription = openai.audio.transcriptions.create(
-                model="whisper-1",
-                file=f,
-            )
-
-        # Acceder correctamente al texto transcrito
-        transcribed_text = transcription.text.strip()
-
-        # Eliminar archivo temporal
-        os.remove(audio_path)
-
-        return transcribed_text
-
-    except Exception as e:
-        logger.error(f"❌ Error transcribiendo el audio: {e}", exc_info=True)
-        return None
@@ -0,0 +1,139 @@
+"""
+Benchmark del cliente HTTP de la Graph API contra un servidor local simulado.
+
+Compara el cliente bloqueante `requests` llamado desde corrutinas (como se
+hacía antes) con el cliente `httpx.AsyncClient` compartido, midiendo cuánto
+tiempo queda bloqueado el event loop mientras se envían N mensajes en
+paralelo.
+
+Uso:
+    python -m scripts.bench_graph_client --requests 200 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from app.services.http_client_service import create_http_client
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Imita `POST /messages` de la Graph API con una latencia fija.
+    """
+
+    protocol_version = "HTTP/1.1"
+    latency_ms = 50
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency_ms / 1000)
+        body = json.dumps({"messages": [{"id": "wamid.stub"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 1024  # Evita que se llene el backlog de accept()
+
+
+def serve_stub(latency_ms: int, ports: multiprocessing.Queue):
+    StubHandler.latency_ms = latency_ms
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_stub_server(latency_ms: int):
+    """
+    Arranca el servidor simulado en otro proceso para que sus hilos no
+    compitan por el GIL con el event loop que se está midiendo.
+    """
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=serve_stub, args=(latency_ms, ports), daemon=True
+    )
+    process.start()
+    return process, ports.get(timeout=10)
+
+
+async def measure_loop_lag(stop: asyncio.Event, tick: float = 0.001) -> dict:
+    """
+    Mide cuánto se retrasan los ticks del event loop respecto a lo esperado.
+    """
+    loop = asyncio.get_running_loop()
+    blocked, worst = 0.0, 0.0
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(tick)
+        lag = loop.time() - start - tick
+        if lag > 0.005:  # Por debajo de 5 ms es ruido del planificador
+            blocked += lag
+            worst = max(worst, lag)
+    return {"blocked_ms": blocked * 1000, "worst_ms": worst * 1000}
+
+
+PAYLOAD = {
+    "messaging_product": "whatsapp",
+    "recipient_type": "individual",
+    "to": "34600000000",
+    "type": "text",
+    "text": {"body": "Hola 👋"},
+}
+
+
+async def run(name: str, send, total: int) -> None:
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    lag = await lag_task
+    print(
+        f"{name:<10} total={elapsed * 1000:8.1f} ms  "
+        f"loop bloqueado={lag['blocked_ms']:8.1f} ms  "
+        f"peor bloqueo={lag['worst_ms']:7.1f} ms"
+    )
+
+
+async def main(total: int, latency_ms: int):
+    server, port = start_stub_server(latency_ms)
+    url = f"http://127.0.0.1:{port}/messages"
+    print(f"{total} envíos contra {url} (latencia simulada {latency_ms} ms)\n")
+
+    async def send_blocking():
+        requests.post(url, json=PAYLOAD, headers={"Authorization": "Bearer x"})
+
+    client = create_http_client()
+
+    async def send_async():
+        await client.post(url, json=PAYLOAD, headers={"Authorization": "Bearer x"})
+
+    await run("requests", send_blocking, total)
+    await run("httpx", send_async, total)
+
+    await client.aclose()
+    server.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests, args.latency_ms))
@@ -0,0 +1,115 @@
+"""
+Benchmark de los formatos del menú en el prompt.
+
+Genera menús sintéticos con el tamaño de cartas reales (categorías, platos
+con ingredientes, extras y un porcentaje de platos agotados) y, para cada
+codificador de `MENU_ENCODERS`, mide tamaño en caracteres, tokens y tiempo
+de codificación.
+
+Uso:
+    python -m scripts.bench_menu_encoding --items 50 300 1000
+"""
+
+import argparse
+import random
+import time
+
+from app.services.history_manager_service import count_tokens, load_tokenizer
+from app.services.menu_encoding_service import MENU_ENCODERS
+
+CATEGORIES = [
+    "Entrantes",
+    "Ensaladas",
+    "Hamburguesas",
+    "Pizzas",
+    "Carnes a la brasa",
+    "Pescados",
+    "Pastas",
+    "Postres",
+    "Refrescos",
+    "Cervezas",
+    "Vinos",
+]
+INGREDIENTS = [
+    "tomate",
+    "lechuga",
+    "cebolla caramelizada",
+    "queso cheddar",
+    "mozzarella",
+    "bacon",
+    "huevo",
+    "pimiento asado",
+    "champiñones",
+    "salsa barbacoa",
+    "alioli",
+    "rúcula",
+    "parmesano",
+    "aceitunas",
+    "atún",
+    "pollo",
+    "ternera",
+    "jamón ibérico",
+]
+EXTRAS = ["Queso extra", "Bacon", "Huevo", "Jalapeños", "Patatas", "Salsa picante"]
+
+
+def build_menu(total_items: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    menu = [{"name": name, "items": []} for name in CATEGORIES]
+    for index in range(total_items):
+        category = menu[index % len(menu)]
+        category["items"].append(
+            {
+                "name": f"{category['name'][:-1]} especial {index + 1}",
+                "ingredients": ", ".join(rng.sample(INGREDIENTS, rng.randint(2, 6))),
+                "price": round(rng.uniform(2, 28), 2),
+                "available": rng.random() > 0.15,
+                "extras": [
+                    {
+                        "name": extra,
+                        "price": round(rng.uniform(0.5, 3), 2),
+                        "available": rng.random() > 0.1,
+                    }
+                    for extra in rng.sample(EXTRAS, rng.randint(0, 3))
+                ],
+            }
+        )
+    return menu
+
+
+def measure(encode, menu: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encode(menu)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(sizes: list, repeat: int):
+    tokenizer = load_tokenizer()
+    if tokenizer is None:
+        print("⚠️ Sin tokenizador local: los tokens son una estimación.\n")
+
+    for size in sizes:
+        menu = build_menu(size)
+        print(f"Menú de {size} platos")
+        baseline = None
+        for encoder in MENU_ENCODERS.values():
+            text = encoder.encode(menu)
+            tokens = count_tokens(text)
+            baseline = baseline or tokens
+            elapsed = measure(encoder.encode, menu, repeat)
+            print(
+                f"  {encoder.name:<6} caracteres={len(text):8d}  "
+                f"tokens={tokens:7d} ({tokens / baseline:6.1%})  "
+                f"codificación={elapsed * 1000:7.2f} ms"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[50, 300, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    main(args.items, args.repeat)
@@ -0,0 +1,157 @@
+"""
+Benchmark de la carga de menús (`POST /menu/upload`).
+
+Compara la carga anterior, con una consulta por categoría, plato y extra y
+un `flush` tras cada inserción, con `upsert_menu`, que lee el menú actual en
+tres consultas y aplica las diferencias con INSERT/UPDATE masivos. Cuenta
+las sentencias enviadas a la base de datos (viajes de ida y vuelta) y el
+tiempo, para una carga inicial y para una recarga con precios cambiados.
+
+Usa una base SQLite en memoria: con PostgreSQL en red cada viaje cuesta
+además la latencia de la red.
+
+Uso:
+    python -m scripts.bench_menu_upload --items 30 300 1000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models.base import Base
+from app.models.menu import Category, Extra, MenuItem
+from app.models.tenants import Tenant
+from app.schemas.menu import MenuSchema
+from app.services.menu_service import upsert_menu
+from scripts.bench_menu_encoding import build_menu
+
+TENANT_ID = 1
+
+
+async def upload_row_by_row(db, tenant_id: int, categories):
+    # Carga anterior de `upload_menu`, tal cual
+    for category_data in categories:
+        category = (
+            await db.execute(
+                select(Category).where(
+                    Category.name == category_data.name, Category.tenant_id == tenant_id
+                )
+            )
+        ).scalar_one_or_none()
+        if not category:
+            category = Category(name=category_data.name, tenant_id=tenant_id)
+            db.add(category)
+            await db.flush()
+
+        for item_data in category_data.items:
+            menu_item = (
+                await db.execute(
+                    select(MenuItem).where(
+                        MenuItem.name == item_data.name,
+                        MenuItem.category_id == category.id,
+                        MenuItem.tenant_id == tenant_id,
+                    )
+                )
+            ).scalar_one_or_none()
+            if not menu_item:
+                menu_item = MenuItem(
+                    name=item_data.name,
+                    ingredients=item_data.ingredients,
+                    price=item_data.price,
+                    available=item_data.available,
+                    category_id=category.id,
+                    tenant_id=tenant_id,
+                )
+                db.add(menu_item)
+                await db.flush()
+
+            for extra_data in item_data.extras:
+                extra = (
+                    await db.execute(
+                        select(Extra).where(
+                            Extra.name == extra_data.name,
+                            Extra.menu_item_id == menu_item.id,
+                            Extra.tenant_id == tenant_id,
+                        )
+                    )
+                ).scalar_one_or_none()
+                if not extra:
+                    db.add(
+                        Extra(
+                            name=extra_data.name,
+                            price=extra_data.price,
+                            available=extra_data.available,
+                            menu_item_id=menu_item.id,
+                            tenant_id=tenant_id,
+                        )
+                    )
+
+
+def reprice(menu: list) -> list:
+    # Recarga típica: cambian algunos precios y la disponibilidad de otros
+    for category in menu:
+        for index, item in enumerate(category["items"]):
+            if index % 5 == 0:
+                item["price"] = round(item["price"] + 0.5, 2)
+            if index % 7 == 0:
+                item["available"] = not item["available"]
+    return menu
+
+
+async def run(upload, size: int) -> list:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    statements = []
+    event.listen(
+        engine.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(1),
+    )
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        db.add(Tenant(id=TENANT_ID, name="Bench", phone_number="1", whatsapp_token="t"))
+        await db.commit()
+
+    results = []
+    for label, menu in (
+        ("carga inicial", build_menu(size)),
+        ("recarga", reprice(build_menu(size))),
+    ):
+        categories = MenuSchema(tenant_id=TENANT_ID, categories=menu).categories
+        statements.clear()
+        start = time.perf_counter()
+        async with session_factory() as db:
+            await upload(db, TENANT_ID, categories)
+            await db.commit()
+        results.append((label, len(statements), time.perf_counter() - start))
+
+    await engine.dispose()
+    return results
+
+
+async def main(sizes: list):
+    for size in sizes:
+        print(f"Menú de {size} platos")
+        for name, upload in (
+            ("fila a fila", upload_row_by_row),
+            ("upsert_menu", upsert_menu),
+        ):
+            for label, statements, elapsed in await run(upload, size):
+                print(
+                    f"  {name:<12} {label:<14} sentencias={statements:6d}  "
+                    f"tiempo={elapsed * 1000:8.1f} ms"
+                )
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[30, 300, 1000])
+    args = parser.parse_args()
+
+    asyncio.run(main(args.items))
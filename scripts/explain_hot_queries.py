@@ -0,0 +1,277 @@
+"""
+Comprueba con EXPLAIN que las consultas frecuentes usan un índice.
+
+Por defecto crea una base SQLite en memoria con el esquema de los modelos y
+datos de ejemplo. Con `--database-url` se ejecuta contra una base existente
+(p. ej. PostgreSQL ya migrada con Alembic); ahí se desactiva el seq scan
+para que el plan muestre el índice aunque las tablas sean pequeñas.
+
+Termina con código 1 si alguna consulta no usa un índice.
+
+Uso:
+    python -m scripts.explain_hot_queries
+    python -m scripts.explain_hot_queries --database-url postgresql+psycopg2://...
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session as DBSession
+
+from app.models.base import Base
+from app.models.menu import Category, Extra, MenuItem
+from app.models.order import Order, OrderItem, Payment
+from app.models.sessions import ConversationTurn, Session
+from app.models.tenants import Tenant
+from app.models.whatsapp import ProcessedMessage
+
+TENANT_ID = 1
+
+
+def hot_queries() -> list:
+    """
+    Las mismas condiciones que usan los servicios y rutas en cada petición.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=7)
+    return [
+        (
+            "sesión activa del usuario",
+            select(Session).filter(
+                Session.user_id == "34600000010",
+                Session.active,
+                Session.tenant_id == TENANT_ID,
+            ),
+        ),
+        (
+            "tenant por número de WhatsApp",
+            select(Tenant).where(Tenant.phone_number == "34900000001"),
+        ),
+        (
+            "pedido por número y tenant",
+            select(Order).where(
+                Order.order_number == "A0000010", Order.tenant_id == TENANT_ID
+            ),
+        ),
+        (
+            "líneas del pedido",
+            select(OrderItem).where(OrderItem.order_id == 10),
+        ),
+        (
+            "pago del pedido",
+            select(Payment).where(Payment.order_id == 10),
+        ),
+        (
+            "categoría por nombre",
+            select(Category).where(
+                Category.name == "Categoría 3", Category.tenant_id == TENANT_ID
+            ),
+        ),
+        (
+            "categorías del menú",
+            select(Category).where(Category.tenant_id == TENANT_ID),
+        ),
+        (
+            "plato por nombre y categoría",
+            select(MenuItem).where(
+                MenuItem.name == "Plato 3-4",
+                MenuItem.category_id == 3,
+                MenuItem.tenant_id == TENANT_ID,
+            ),
+        ),
+        (
+            "platos de las categorías (selectinload)",
+            select(MenuItem).where(MenuItem.category_id.in_([1, 2, 3])),
+        ),
+        (
+            "extra por nombre y plato",
+            select(Extra).where(
+                Extra.name == "Extra 2",
+                Extra.menu_item_id == 7,
+                Extra.tenant_id == TENANT_ID,
+            ),
+        ),
+        (
+            "extras de los platos (selectinload)",
+            select(Extra).where(Extra.menu_item_id.in_([1, 2, 3])),
+        ),
+        (
+            "mensajes procesados caducados",
+            select(ProcessedMessage.message_id)
+            .where(ProcessedMessage.created_at < cutoff)
+            .limit(500),
+        ),
+        (
+            "últimos turnos de la conversación",
+            select(ConversationTurn.seq)
+            .where(ConversationTurn.session_id == 10)
+            .order_by(ConversationTurn.seq.desc())
+            .limit(10),
+        ),
+    ]
+
+
+def seed(db: DBSession):
+    now = datetime.now(timezone.utc)
+    for tenant_id in (1, 2):
+        db.add(
+            Tenant(
+                id=tenant_id,
+                name=f"Restaurante {tenant_id}",
+                phone_number=f"3490000000{tenant_id}",
+                whatsapp_token=f"token-{tenant_id}",
+            )
+        )
+    db.flush()
+
+    for index in range(200):
+        tenant_id = 1 + index % 2
+        db.add(
+            Session(
+                id=index + 1,
+                tenant_id=tenant_id,
+                user_id=f"346000000{index:02d}",
+                active=index % 3 != 0,
+                context="{}",
+            )
+        )
+        db.add(
+            Order(
+                id=index + 1,
+                tenant_id=tenant_id,
+                order_number=f"A{index:07d}",
+                table_number=1,
+                total=10,
+            )
+        )
+        db.flush()
+        db.add(
+            OrderItem(
+                tenant_id=tenant_id,
+                order_id=index + 1,
+                product_name="Plato",
+                unit_price=10,
+                quantity=1,
+                subtotal=10,
+            )
+        )
+        db.add(
+            Payment(tenant_id=tenant_id, order_id=index + 1, method="redsys", amount=10)
+        )
+        db.add(
+            ProcessedMessage(
+                message_id=f"wamid.{index}",
+                tenant_id=tenant_id,
+                created_at=now - timedelta(days=index % 14),
+            )
+        )
+        for seq in range(1, 6):
+            db.add(
+                ConversationTurn(
+                    tenant_id=tenant_id,
+                    session_id=index + 1,
+                    seq=seq,
+                    user_message="hola",
+                    bot_response="hola",
+                )
+            )
+
+    # Otros tenants con su propia carta, para que filtrar por tenant sea selectivo
+    for other_tenant in range(3, 11):
+        db.add(
+            Tenant(
+                id=other_tenant,
+                name=f"Restaurante {other_tenant}",
+                phone_number=f"349000000{other_tenant:02d}",
+                whatsapp_token=f"token-{other_tenant}",
+            )
+        )
+        for category_index in range(20):
+            db.add(Category(tenant_id=other_tenant, name=f"Categoría {category_index}"))
+    db.flush()
+
+    for category_index in range(1, 21):
+        category = Category(tenant_id=TENANT_ID, name=f"Categoría {category_index}")
+        db.add(category)
+        db.flush()
+        for item_index in range(10):
+            item = MenuItem(
+                tenant_id=TENANT_ID,
+                category_id=category.id,
+                name=f"Plato {category_index}-{item_index}",
+                price=9.5,
+            )
+            db.add(item)
+            db.flush()
+            for extra_index in range(3):
+                db.add(
+                    Extra(
+                        tenant_id=TENANT_ID,
+                        menu_item_id=item.id,
+                        name=f"Extra {extra_index}",
+                        price=1,
+                    )
+                )
+    db.commit()
+
+
+def explain(connection, statement) -> str:
+    sql = str(
+        statement.compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    if connection.dialect.name == "postgresql":
+        plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        return json.dumps(plan) if not isinstance(plan, str) else plan
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def uses_index(plan: str) -> bool:
+    markers = (
+        "USING INDEX",
+        "USING COVERING INDEX",
+        "USING INTEGER PRIMARY KEY",
+        "USING PRIMARY KEY",
+        "Index Scan",
+        "Index Only Scan",
+        "Bitmap Index Scan",
+    )
+    full_scan = "SCAN " in plan and "USING" not in plan
+    return any(marker in plan for marker in markers) and not full_scan
+
+
+def main(database_url: str) -> int:
+    engine = create_engine(database_url)
+    if database_url.startswith("sqlite"):
+        Base.metadata.create_all(engine)
+        with DBSession(engine) as db:
+            seed(db)
+        with engine.connect() as connection:
+            connection.execute(text("ANALYZE"))
+
+    failures = 0
+    with engine.connect() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SET enable_seqscan = off"))
+
+        for name, statement in hot_queries():
+            plan = explain(connection, statement)
+            ok = uses_index(plan)
+            failures += not ok
+            summary = " ".join(plan.split())[:140]
+            print(f"{'✅' if ok else '❌'} {name:<42} {summary}")
+
+    print(f"\n{len(hot_queries()) - failures} de {len(hot_queries())} usan un índice")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    sys.exit(main(args.database_url))